@@ -3,7 +3,9 @@ import sys
 sys.path.append("/app")
 
 from typing import List, Dict
-import json, os, random
+import json, os, random, time
+
+from google.cloud import bigquery
 
 import src
 
@@ -15,12 +17,26 @@ TOP_BRANDS_ALPHA = 0.3
 IS_WOMEN_ALPHA = 0.7
 SORT_BY_DATE_ALPHA = 0.5
 RUNNER_MODE = "api"
+NUM_WORKERS = 4
+PARSE_PROCESSES = 2
+BATCH_BY_SELLER = True
+PRIORITIZE = True
+REQUEST_BUDGET = 20000
+SOLD_LOOKBACK_DAYS = 45
+TASK_COUNT = int(os.getenv("CLOUD_RUN_TASK_COUNT", 1))
+TASK_INDEX = int(os.getenv("CLOUD_RUN_TASK_INDEX", 0))
+EXECUTION_ID = os.getenv("CLOUD_RUN_EXECUTION")
+FROM_CANDIDATES = True
+MAX_QUERY_BYTES = int(os.getenv("MAX_QUERY_BYTES", 100 * 1024**3))
+NUM_CHUNKS = 64
+LEASE_TIME_BUDGET = 3000
+LEASE_PATH = os.getenv("LEASE_PATH")
 
 
 def init_runner() -> src.runner.Runner:
     secrets = json.loads(os.getenv("SECRETS_JSON"))
 
-    bq_client, pinecone_index, vinted_client, driver, _ = src.config.init_clients(
+    bq_client, pinecone_index, vinted_client, driver_pool, _ = src.config.init_clients(
         secrets=secrets,
         mode=RUNNER_MODE,
     )
@@ -29,16 +45,22 @@ def init_runner() -> src.runner.Runner:
         bq_client=bq_client,
         pinecone_index=pinecone_index,
         vinted_client=vinted_client,
-        driver=driver,
+        driver_pool=driver_pool,
         vintage_dressing_alpha=VINTED_DRESSING_ALPHA,
         top_brands_alpha=TOP_BRANDS_ALPHA,
         is_women_alpha=IS_WOMEN_ALPHA,
         sort_by_date_alpha=SORT_BY_DATE_ALPHA,
+        seed=EXECUTION_ID,
     )
 
     return src.runner.Runner(
         mode=RUNNER_MODE,
         config=config,
+        num_workers=NUM_WORKERS,
+        parse_processes=PARSE_PROCESSES,
+        cache=src.cache.StatusCache(),
+        outbox=src.outbox.Outbox(),
+        batch_by_seller=BATCH_BY_SELLER,
     )
 
 
@@ -48,36 +70,135 @@ def from_pinecone() -> bool:
 
 def get_loader(
     runner: src.runner.Runner,
-) -> List[Dict]:
+) -> src.models.ArrowDataLoader:
     query_kwargs = {
         "n": NUM_ITEMS,
         "only_top_brands": runner.config.only_top_brands,
         "only_vintage_dressing": runner.config.only_vintage_dressing,
         "is_women": runner.config.is_women,
         "sort_by_date": runner.config.sort_by_date,
+        "with_user_id": runner.batch_by_seller,
+        "keyset": True,
+        "from_candidates": FROM_CANDIDATES,
+    }
+
+    key_columns, _ = src.bigquery.get_keyset_order(
+        sort_by_date=runner.config.sort_by_date
+    )
+    run_kwargs = {
+        "to_arrow": True,
+        "key_columns": key_columns,
+        "max_bytes": MAX_QUERY_BYTES,
     }
 
-    query = src.bigquery.query_items(index=runner.config.index, **query_kwargs)
+    cursor = src.bigquery.get_job_cursor(runner.config.bq_client, runner.config.id)
+    query = src.bigquery.query_items(after=cursor, **query_kwargs)
 
     loader = src.bigquery.run_query(
-        client=runner.config.bq_client, query=query, to_list=False
+        client=runner.config.bq_client, query=query, **run_kwargs
     )
 
-    if loader.total_rows == 0:
-        runner.config.index = 0
-        query = src.bigquery.query_items(index=runner.config.index, **query_kwargs)
+    if loader.total_rows == 0 and cursor is not None:
+        query = src.bigquery.query_items(**query_kwargs)
         loader = src.bigquery.run_query(
-            client=runner.config.bq_client, query=query, to_list=False
+            client=runner.config.bq_client, query=query, **run_kwargs
         )
 
+    loader.on_cursor = lambda cursor: save_cursor(runner, cursor)
+
     return loader
 
 
-def get_loader_from_pinecone(
-    runner: src.runner.Runner
+def save_cursor(runner: src.runner.Runner, cursor: Dict) -> None:
+    if not src.bigquery.update_job_cursor(
+        runner.config.bq_client, runner.config.id, cursor
+    ):
+        print(f"Failed to save job cursor for {runner.config.id} at {cursor}.")
+
+
+def get_scoring_loader(runner: src.runner.Runner) -> src.models.ArrowDataLoader:
+    query = src.bigquery.query_items(
+        only_top_brands=runner.config.only_top_brands,
+        only_vintage_dressing=runner.config.only_vintage_dressing,
+        is_women=runner.config.is_women,
+        with_user_id=runner.batch_by_seller,
+        with_features=True,
+        from_candidates=FROM_CANDIDATES,
+    )
+
+    return src.bigquery.run_query(
+        client=runner.config.bq_client,
+        query=query,
+        to_arrow=True,
+        max_bytes=MAX_QUERY_BYTES,
+    )
+
+
+def get_partition_loader(
+    runner: src.runner.Runner, lease: src.lease.Lease
+) -> bigquery.table.RowIterator:
+    query = src.bigquery.query_items(
+        only_top_brands=runner.config.only_top_brands,
+        only_vintage_dressing=runner.config.only_vintage_dressing,
+        is_women=runner.config.is_women,
+        sort_by_date=runner.config.sort_by_date,
+        with_user_id=runner.batch_by_seller,
+        partition=lease.partition,
+        from_candidates=FROM_CANDIDATES,
+    )
+
+    return src.bigquery.run_query(
+        client=runner.config.bq_client,
+        query=query,
+        to_list=False,
+        max_bytes=MAX_QUERY_BYTES,
+    )
+
+
+def run_leased(runner: src.runner.Runner) -> None:
+    if LEASE_PATH:
+        store = src.lease.LocalLeaseStore(LEASE_PATH)
+    else:
+        store = src.lease.BigQueryLeaseStore(runner.config.bq_client)
+
+    owner = src.lease.get_owner()
+    started_at = time.monotonic()
+
+    while time.monotonic() - started_at < LEASE_TIME_BUDGET:
+        lease = store.claim(runner.config.id, owner, NUM_CHUNKS)
+
+        if lease is None:
+            break
+
+        print(f"Leased chunk {lease.chunk}/{lease.num_chunks} as {owner}")
+
+        with src.lease.renewing(store, lease):
+            loader = get_partition_loader(runner, lease)
+            runner.run(src.lease.until_lost(loader, lease))
+
+        if not lease.lost and store.complete(lease):
+            print(f"Completed chunk {lease.chunk}/{lease.num_chunks}")
+
+
+def prioritize(
+    runner: src.runner.Runner, loader: src.models.ArrowDataLoader
 ) -> src.models.PineconeDataLoader:
+    query = src.bigquery.query_sold_rates(SOLD_LOOKBACK_DAYS)
+    rows = src.bigquery.run_query(
+        client=runner.config.bq_client, query=query, max_bytes=MAX_QUERY_BYTES
+    )
+
+    model = src.scheduler.SellProbabilityModel().fit(rows)
+    scheduler = src.scheduler.PriorityScheduler(model, runner.cache)
+
+    return scheduler.schedule(loader.iter_rows(), REQUEST_BUDGET)
+
+
+def get_loader_from_pinecone(
+    runner: src.runner.Runner, sampler: src.bigquery.BucketSampler
+) -> src.models.StreamDataLoader:
     query = src.bigquery.query_vector_ids(
-        n=src.pinecone.BATCH_SIZE, index=runner.config.index, shuffle=True
+        n=src.pinecone.BATCH_SIZE, sample=sampler.next()
     )
 
     response = src.bigquery.run_query(
@@ -95,19 +216,48 @@ if __name__ == "__main__":
     runner = init_runner()
     print(f"Config: {runner.config.id} | Index: {runner.config.index}")
 
-    if from_pinecone():
-        while True:
-            data_loader = get_loader_from_pinecone(runner)
+    if FROM_CANDIDATES and TASK_INDEX == 0:
+        if src.bigquery.refresh_candidates(runner.config.bq_client):
+            print("Refreshed check candidates.")
+
+    if TASK_COUNT > 1:
+        run_leased(runner)
+
+    elif from_pinecone():
+        num_buckets = src.bigquery.get_num_buckets(
+            runner.config.bq_client,
+            src.enums.PINECONE_TABLE_ID,
+            src.pinecone.BATCH_SIZE // 2,
+        )
+        sampler = src.bigquery.BucketSampler(num_buckets, start=runner.config.index)
+
+        chunks = src.pipeline.ChunkSource(
+            load=lambda _: get_loader_from_pinecone(runner, sampler),
+            start=runner.config.index,
+        )
+
+        for index, data_loader in chunks:
             runner.run(data_loader)
+            runner.config.set_index((index + 1) % num_buckets)
+
+            src.bigquery.update_job_index(
+                client=runner.config.bq_client,
+                job_id=runner.config.id,
+                index=runner.config.index,
+            )
+            print(src.bigquery.QUERY_LOG.summary())
+
+    elif PRIORITIZE:
+        runner.run(prioritize(runner, get_scoring_loader(runner)))
 
     else:
         data_loader = get_loader(runner)
+        runner.run(data_loader)
 
-        if src.bigquery.update_job_index(
-            runner.config.bq_client, runner.config.id, runner.config.index + 1
-        ):
+        if data_loader.cursor is not None:
             print(
-                f"Updated job index for {runner.config.id} to {runner.config.index+1}."
+                f"Updated job cursor for {runner.config.id} to {data_loader.cursor}."
             )
 
-        runner.run(data_loader)
+    runner.close()
+    print(src.bigquery.QUERY_LOG.summary())
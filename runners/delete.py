@@ -2,6 +2,7 @@ import sys
 
 sys.path.append("/app")
 
+from typing import List
 import json, os, pinecone
 import src
 
@@ -9,6 +10,24 @@ import src
 LOOKBACK_DAYS = 45
 SUCCESS_RATE_THRESHOLD = 0.8
 PINECONE_ID_FIELD = "point_id"
+FAILED_PATH = "failed.json"
+MAX_QUERY_BYTES = int(os.getenv("MAX_QUERY_BYTES", 100 * 1024**3))
+
+
+def retry_failed(pinecone_index: pinecone.Index, failed: List[str]) -> List[str]:
+    if os.path.exists(FAILED_PATH):
+        with open(FAILED_PATH) as f:
+            failed = list(dict.fromkeys(failed + json.load(f)))
+
+        os.remove(FAILED_PATH)
+
+    if not failed:
+        return []
+
+    report = src.pinecone.delete_points_from_ids(index=pinecone_index, ids=failed)
+    print(f"Pinecone retry: {report.n_deleted:,}/{report.n_ids:,} points")
+
+    return report.failed
 
 
 def main():
@@ -18,37 +37,53 @@ def main():
         secrets=secrets,
     )
 
-    query = src.bigquery.query_points_to_delete(LOOKBACK_DAYS)
-    iterator = src.bigquery.run_query(bq_client, query, to_list=False)
+    dated = src.retention.has_point_dates(bq_client)
+
+    if dated:
+        n_backfilled = src.retention.backfill(bq_client)
+        print(f"Backfilled dates for {n_backfilled:,} points")
+    else:
+        print("Points are not dated yet, run runners/migrate.py")
+
+    cutoff = src.retention.get_cutoff(LOOKBACK_DAYS)
+
+    query = src.bigquery.query_points_to_delete(cutoff, dated)
+    iterator = src.bigquery.run_query(
+        bq_client, query, to_list=False, max_bytes=MAX_QUERY_BYTES
+    )
 
     print(f"Total rows: {iterator.total_rows:,}")
 
-    success_rate, failed = src.pinecone.delete_points_from_bigquery_iterator(
+    report = src.pinecone.delete_points_from_bigquery_iterator(
         index=pinecone_index,
         iterator=iterator,
         id_field=PINECONE_ID_FIELD,
         verbose=True,
     )
 
-    print(f"Pinecone: {success_rate:.2f}")
+    print(
+        f"Pinecone: {report.success_rate:.2f} "
+        f"({report.n_deleted:,}/{report.n_ids:,} points, "
+        f"{report.n_batches_deleted:,}/{report.n_batches:,} batches, "
+        f"{report.n_calls:,} calls)"
+    )
+
+    failed = retry_failed(pinecone_index, report.failed)
 
     if failed:
-        src.utils.save_json(failed, "failed.json")
+        src.utils.save_json(failed, FAILED_PATH)
         print(f"Failed: {len(failed)}")
 
-    if success_rate > SUCCESS_RATE_THRESHOLD:
-        query = src.bigquery.query_delete_points(LOOKBACK_DAYS)
-        success_points = src.bigquery.run_query(bq_client, query, to_list=False)
+    if report.success_rate > SUCCESS_RATE_THRESHOLD:
+        deleted = src.retention.expire(bq_client, cutoff, dated)
 
-        query = src.bigquery.query_delete_items(LOOKBACK_DAYS)
-        success_items = src.bigquery.run_query(bq_client, query, to_list=False)
+        for table_id, n_deleted in deleted.items():
+            print(f"BigQuery {table_id}: {n_deleted:,} rows deleted")
 
-        query = src.bigquery.query_delete_sold(LOOKBACK_DAYS)
-        success_sold = src.bigquery.run_query(bq_client, query, to_list=False)
+    n_orphans = src.retention.remove_orphan_candidates(bq_client)
+    print(f"BigQuery candidates: {n_orphans:,} orphans deleted")
 
-        print(f"BigQuery items: {success_items}")
-        print(f"BigQuery points: {success_points}")
-        print(f"BigQuery sold: {success_sold}")
+    print(src.bigquery.QUERY_LOG.summary())
 
 
 if __name__ == "__main__":
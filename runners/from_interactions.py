@@ -12,12 +12,14 @@ NUM_ITEMS = 1000
 NUM_NEIGHBORS = 50
 SHUFFLE = True
 RUNNER_MODE = "api"
+NUM_WORKERS = 4
+PARSE_PROCESSES = 2
 
 
 def init_runner() -> src.runner.Runner:
     secrets = json.loads(os.getenv("SECRETS_JSON"))
 
-    bq_client, pinecone_index, vinted_client, driver, _ = src.config.init_clients(
+    bq_client, pinecone_index, vinted_client, driver_pool, _ = src.config.init_clients(
         secrets=secrets,
         mode=RUNNER_MODE,
     )
@@ -26,29 +28,38 @@ def init_runner() -> src.runner.Runner:
         bq_client=bq_client,
         pinecone_index=pinecone_index,
         vinted_client=vinted_client,
-        driver=driver,
+        driver_pool=driver_pool,
         from_interactions=True,
     )
 
     return src.runner.Runner(
         mode=RUNNER_MODE,
         config=config,
+        num_workers=NUM_WORKERS,
+        parse_processes=PARSE_PROCESSES,
+        cache=src.cache.StatusCache(),
+        outbox=src.outbox.Outbox(),
     )
 
 
-def load_point_ids(runner: src.runner.Runner) -> List[str]:
+def load_point_ids(runner: src.runner.Runner, num_buckets: int = 1) -> List[str]:
+    sample = None
+
+    if SHUFFLE:
+        sample = (runner.config.index % num_buckets, num_buckets)
+
     query = src.bigquery.query_interaction_items(
         n=NUM_ITEMS,
-        shuffle=SHUFFLE,
+        sample=sample,
     )
 
     loader = src.bigquery.run_query(
         client=runner.config.bq_client, query=query, to_list=False
     )
 
-    if loader.total_rows == 0:
+    if loader.total_rows == 0 and SHUFFLE and sample[0] != 0:
         runner.config.index = 0
-        loader = load_point_ids(runner)
+        return load_point_ids(runner, num_buckets)
 
     point_ids = []
     for row in loader:
@@ -61,12 +72,15 @@ def load_point_ids(runner: src.runner.Runner) -> List[str]:
 if __name__ == "__main__":
     runner = init_runner()
 
-    if not SHUFFLE and src.bigquery.update_job_index(
+    if src.bigquery.update_job_index(
         runner.config.bq_client, runner.config.id, runner.config.index + 1
     ):
         print(f"Updated job index for {runner.config.id} to {runner.config.index+1}.")
 
-    point_ids = load_point_ids(runner)
+    num_buckets = src.bigquery.get_num_interaction_buckets(
+        runner.config.bq_client, NUM_ITEMS // 2
+    )
+    point_ids = load_point_ids(runner, num_buckets)
     loop = tqdm.tqdm(iterable=point_ids, total=len(point_ids))
 
     for point_id in loop:
@@ -77,3 +91,5 @@ if __name__ == "__main__":
         )
 
         runner.run(data_loader, loop)
+
+    runner.close()
@@ -0,0 +1,40 @@
+import sys
+
+sys.path.append("/app")
+
+import json, os
+
+from google.cloud import bigquery
+
+import src
+
+
+def add_job_cursor(client: bigquery.Client) -> None:
+    src.bigquery.execute(client, src.bigquery.query_add_job_cursor()).result()
+
+
+def create_lease_table(client: bigquery.Client) -> None:
+    src.bigquery.execute(client, src.bigquery.query_create_lease_table()).result()
+
+
+MIGRATIONS = [
+    add_job_cursor,
+    create_lease_table,
+    src.retention.partition_tables,
+]
+
+
+def main():
+    secrets = json.loads(os.getenv("SECRETS_JSON"))
+
+    bq_client, _, _, _, _ = src.config.init_clients(
+        secrets=secrets,
+    )
+
+    for migration in MIGRATIONS:
+        migration(bq_client)
+        print(f"Applied migration: {migration.__name__}")
+
+
+if __name__ == "__main__":
+    main()
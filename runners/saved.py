@@ -9,6 +9,8 @@ import src
 
 NUM_ITEMS = 1000
 RUNNER_MODE = "api"
+NUM_WORKERS = 4
+PARSE_PROCESSES = 2
 JOB_ID = "saved"
 
 
@@ -18,44 +20,39 @@ def init_runner() -> src.runner.Runner:
         supabase_client=supabase_client,
         pinecone_index=pinecone_index,
         vinted_client=vinted_client,
-        driver=driver,
+        driver_pool=driver_pool,
         from_saved=True,
     )
 
     return src.runner.Runner(
         mode=RUNNER_MODE,
         config=config,
+        num_workers=NUM_WORKERS,
+        parse_processes=PARSE_PROCESSES,
+        cache=src.cache.StatusCache(),
+        outbox=src.outbox.Outbox(),
     )
 
 
-def get_loader(runner: src.runner.Runner) -> src.models.PineconeDataLoader:
+def get_loader(runner: src.runner.Runner, index: int) -> src.models.PineconeDataLoader:
     entries = src.supabase.get_saved_items(
         client=runner.config.supabase_client,
         n=NUM_ITEMS,
-        index=runner.config.index,
+        index=index,
     )
 
-    if len(entries) == 0:
-        runner.config.index = 0
-
-        entries = src.supabase.get_saved_items(
-            client=runner.config.supabase_client,
-            n=NUM_ITEMS,
-            index=runner.config.index,
-        )
-
     return src.models.PineconeDataLoader(entries)
 
 
 if __name__ == "__main__":
     secrets = json.loads(os.getenv("SECRETS_JSON"))
-    global bq_client, pinecone_index, vinted_client, driver, supabase_client
+    global bq_client, pinecone_index, vinted_client, driver_pool, supabase_client
 
     (
         bq_client,
         pinecone_index,
         vinted_client,
-        driver,
+        driver_pool,
         supabase_client,
     ) = src.config.init_clients(
         secrets=secrets,
@@ -64,15 +61,15 @@ if __name__ == "__main__":
     )
 
     runner = init_runner()
-    index = runner.config.index
 
-    while True:
-        print(f"Config: {runner.config.id} | Index: {runner.config.index}")
-
-        data_loader = get_loader(runner)
+    chunks = src.pipeline.ChunkSource(
+        load=lambda index: get_loader(runner, index),
+        start=runner.config.index,
+        wrap=True,
+    )
 
-        if len(data_loader.entries) == 0:
-            raise Exception("No entries found")
+    for index, data_loader in chunks:
+        print(f"Config: {runner.config.id} | Index: {index}")
 
         runner.run(data_loader)
         runner.config.set_index(index + 1)
@@ -82,3 +79,6 @@ if __name__ == "__main__":
             job_id=JOB_ID,
             index=runner.config.index,
         )
+
+    runner.close()
+    raise Exception("No entries found")
@@ -5,10 +5,19 @@ from . import (
     status,
     models,
     driver,
-    runner,
     config,
     utils,
     supabase,
+    ratelimit,
+    classifier,
+    cache,
+    scheduler,
+    writer,
+    lease,
+    pipeline,
+    retention,
+    outbox,
+    runner,
 )
 
 
@@ -23,4 +32,13 @@ __all__ = [
     "config",
     "utils",
     "supabase",
+    "ratelimit",
+    "classifier",
+    "cache",
+    "scheduler",
+    "writer",
+    "lease",
+    "pipeline",
+    "retention",
+    "outbox",
 ]
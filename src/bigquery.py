@@ -1,8 +1,102 @@
-from typing import List, Dict, Union, Optional
+from typing import Any, List, Dict, Union, Optional, Tuple
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+import json, math, random, threading, time, weakref
 
 from google.oauth2 import service_account
-from google.cloud import bigquery
+from google.cloud import bigquery, bigquery_storage
 from .enums import *
+from .pipeline import prefetch
+
+
+QUERY_TEMPLATE_CACHE_SIZE = 256
+CANDIDATE_REFRESH_WINDOW = 7 * 24 * 60 * 60
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+KEY_COLUMN_TYPES = {
+    "created_at": "TIMESTAMP",
+    "num_likes": "INT64",
+    "id": "STRING",
+}
+
+_READ_CLIENTS = weakref.WeakKeyDictionary()
+
+
+@dataclass
+class Query:
+    sql: str
+    parameters: List = field(default_factory=list)
+    name: str = "query"
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: [0, 0, 0, 0.0])
+
+    def record(
+        self, name: str, bytes_processed: int, slot_millis: int, wall_time: float
+    ) -> None:
+        with self._lock:
+            stats = self._stats[name]
+            stats[0] += 1
+            stats[1] += bytes_processed
+            stats[2] += slot_millis
+            stats[3] += wall_time
+
+        print(
+            f"BigQuery {name}: {bytes_processed / 1024**3:.2f} GB | "
+            f"{slot_millis / 1000:.1f} slot s | {wall_time:.1f}s"
+        )
+
+    def summary(self) -> str:
+        with self._lock:
+            stats = sorted(self._stats.items(), key=lambda item: -item[1][1])
+
+        total_bytes = sum(s[1] for _, s in stats) or 1
+        lines = [
+            f"{name}: {n} queries | {bytes_processed / 1024**3:.2f} GB "
+            f"({bytes_processed / total_bytes:.0%}) | "
+            f"{slot_millis / 1000:.1f} slot s | {wall_time:.1f}s"
+            for name, (n, bytes_processed, slot_millis, wall_time) in stats
+        ]
+
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+QUERY_LOG = QueryLog()
+
+
+class BucketSampler:
+    def __init__(self, num_buckets: int, start: Optional[int] = None):
+        self.num_buckets = max(1, num_buckets)
+
+        if start is None:
+            start = random.randrange(self.num_buckets)
+
+        self._bucket = start % self.num_buckets
+
+    def next(self) -> Tuple[int, int]:
+        sample = self._bucket, self.num_buckets
+        self._bucket = (self._bucket + 1) % self.num_buckets
+
+        return sample
+
+
+def get_num_buckets(client: bigquery.Client, table_id: str, n: int) -> int:
+    table = client.get_table(f"{PROJECT_ID}.{VINTED_DATASET_ID}.{table_id}")
+
+    return max(1, math.ceil((table.num_rows or 0) / n))
 
 
 def init_bigquery_client(credentials_dict: Dict) -> bigquery.Client:
@@ -14,39 +108,178 @@ def init_bigquery_client(credentials_dict: Dict) -> bigquery.Client:
         credentials_dict
     )
 
-    return bigquery.Client(
+    client = bigquery.Client(
         credentials=credentials, project=credentials_dict["project_id"]
     )
+    _READ_CLIENTS[client] = bigquery_storage.BigQueryReadClient(
+        credentials=credentials
+    )
+
+    return client
 
 
 def run_query(
-    client: bigquery.Client, query: str, to_list: bool = True
-) -> Union[List[Dict], bigquery.table.RowIterator]:
-    job_config = bigquery.QueryJobConfig(use_query_cache=True)
-    query_job = client.query(query, job_config=job_config)
+    client: bigquery.Client,
+    query: Union[str, Query],
+    to_list: bool = True,
+    to_arrow: bool = False,
+    key_columns: Optional[List[str]] = None,
+    max_bytes: Optional[int] = None,
+) -> Union[List[Dict], bigquery.table.RowIterator, "ArrowDataLoader"]:
+    query_job = execute(client, query, max_bytes=max_bytes)
     results = query_job.result()
 
+    if to_arrow:
+        return _to_arrow_loader(client, results, key_columns)
+
     if to_list:
         return [dict(row) for row in results]
     else:
         return results
 
 
+def execute(
+    client: bigquery.Client,
+    query: Union[str, Query],
+    max_bytes: Optional[int] = None,
+) -> bigquery.QueryJob:
+    if isinstance(query, str):
+        query = Query(query)
+
+    if max_bytes:
+        estimate = estimate_bytes(client, query)
+
+        if estimate > max_bytes:
+            raise QueryBudgetExceeded(
+                f"{query.name} would process {estimate:,} bytes "
+                f"(budget: {max_bytes:,})"
+            )
+
+    job_config = bigquery.QueryJobConfig(
+        use_query_cache=True,
+        query_parameters=query.parameters,
+        maximum_bytes_billed=max_bytes,
+    )
+
+    started_at = time.monotonic()
+    query_job = client.query(query.sql, job_config=job_config)
+    query_job.add_done_callback(
+        lambda job: _record(query.name, job, time.monotonic() - started_at)
+    )
+
+    return query_job
+
+
+def estimate_bytes(client: bigquery.Client, query: Query) -> int:
+    job_config = bigquery.QueryJobConfig(
+        dry_run=True, use_query_cache=False, query_parameters=query.parameters
+    )
+    query_job = client.query(query.sql, job_config=job_config)
+
+    return query_job.total_bytes_processed or 0
+
+
+def _record(name: str, job: bigquery.QueryJob, wall_time: float) -> None:
+    try:
+        QUERY_LOG.record(
+            name, job.total_bytes_processed or 0, job.slot_millis or 0, wall_time
+        )
+    except Exception as e:
+        print(e)
+
+
+def _to_arrow_loader(
+    client: bigquery.Client,
+    results: bigquery.table.RowIterator,
+    key_columns: Optional[List[str]] = None,
+) -> "ArrowDataLoader":
+    from .models import ArrowDataLoader
+
+    batches = results.to_arrow_iterable(bqstorage_client=_READ_CLIENTS.get(client))
+
+    return ArrowDataLoader(
+        batches=prefetch(batches),
+        total_rows=results.total_rows,
+        key_columns=key_columns,
+    )
+
+
+def get_job_cursor(client: bigquery.Client, job_id: str) -> Optional[Dict]:
+    query = Query(
+        f"""
+        MERGE `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}` T
+        USING (SELECT @job_id as job_id) S
+        ON T.job_id = S.job_id
+        WHEN NOT MATCHED THEN
+        INSERT (job_id, value) VALUES (@job_id, 0);
+
+        SELECT cursor
+        FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}`
+        WHERE job_id = @job_id;
+        """,
+        [_param("job_id", "STRING", job_id)],
+        name="get_job_cursor",
+    )
+    result = execute(client, query).result()
+
+    for row in result:
+        return json.loads(row.cursor) if row.cursor else None
+
+    return None
+
+
+def update_job_cursor(
+    client: bigquery.Client, job_id: str, cursor: Optional[Dict]
+) -> bool:
+    query = Query(
+        f"""
+        UPDATE `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}`
+        SET cursor = @cursor
+        WHERE job_id = @job_id
+        """,
+        [
+            _param("job_id", "STRING", job_id),
+            _param("cursor", "STRING", json.dumps(cursor) if cursor else None),
+        ],
+        name="update_job_cursor",
+    )
+    try:
+        execute(client, query).result()
+        return True
+    except Exception as e:
+        print(e)
+        return False
+
+
+def query_add_job_cursor() -> Query:
+    return Query(
+        f"""
+        ALTER TABLE `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}`
+        ADD COLUMN IF NOT EXISTS cursor STRING
+        """,
+        name="add_job_cursor",
+    )
+
+
 def get_job_index(client: bigquery.Client, job_id: str) -> int:
-    query = f"""
-    MERGE `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}` T
-    USING (SELECT '{job_id}' as job_id) S
-    ON T.job_id = S.job_id
-    WHEN NOT MATCHED THEN
-    INSERT (job_id, value) VALUES ('{job_id}', 0)
-    WHEN MATCHED THEN
-    UPDATE SET value = value;
-    
-    SELECT value
-    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}`
-    WHERE job_id = '{job_id}';
-    """
-    result = client.query(query).result()
+    query = Query(
+        f"""
+        MERGE `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}` T
+        USING (SELECT @job_id as job_id) S
+        ON T.job_id = S.job_id
+        WHEN NOT MATCHED THEN
+        INSERT (job_id, value) VALUES (@job_id, 0)
+        WHEN MATCHED THEN
+        UPDATE SET value = value;
+
+        SELECT value
+        FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}`
+        WHERE job_id = @job_id;
+        """,
+        [_param("job_id", "STRING", job_id)],
+        name="get_job_index",
+    )
+    result = execute(client, query).result()
 
     for row in result:
         return row.value
@@ -55,19 +288,218 @@ def get_job_index(client: bigquery.Client, job_id: str) -> int:
 
 
 def update_job_index(client: bigquery.Client, job_id: str, index: int) -> bool:
-    query = f"""
-    UPDATE `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}`
-    SET value = {index}
-    WHERE job_id = '{job_id}'
-    """
+    query = Query(
+        f"""
+        UPDATE `{PROJECT_ID}.{VINTED_DATASET_ID}.{INDEX_TABLE_ID}`
+        SET value = @index
+        WHERE job_id = @job_id
+        """,
+        [_param("job_id", "STRING", job_id), _param("index", "INT64", index)],
+        name="update_job_index",
+    )
     try:
-        client.query(query).result()
+        execute(client, query).result()
         return True
     except Exception as e:
         print(e)
         return False
 
 
+def query_create_lease_table() -> Query:
+    sql = f"""
+    CREATE TABLE IF NOT EXISTS `{PROJECT_ID}.{VINTED_DATASET_ID}.{LEASE_TABLE_ID}` (
+        job_id STRING NOT NULL,
+        chunk INT64 NOT NULL,
+        owner STRING NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        done BOOL NOT NULL
+    )
+    CLUSTER BY job_id
+    """
+
+    return Query(sql, name="create_lease_table")
+
+
+def query_claim_lease(job_id: str, owner: str, num_chunks: int, ttl: int) -> Query:
+    table = f"`{PROJECT_ID}.{VINTED_DATASET_ID}.{LEASE_TABLE_ID}`"
+    expires_at = "TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL @ttl SECOND)"
+
+    sql = f"""
+    BEGIN TRANSACTION;
+
+    IF (
+        SELECT COUNTIF(done) FROM {table} WHERE job_id = @job_id
+    ) >= @num_chunks THEN
+        DELETE FROM {table} WHERE job_id = @job_id;
+    END IF;
+
+    CREATE TEMP TABLE claimed AS
+    SELECT chunk
+    FROM UNNEST(GENERATE_ARRAY(0, @num_chunks - 1)) AS chunk
+    WHERE chunk NOT IN (
+        SELECT chunk FROM {table}
+        WHERE job_id = @job_id AND (done OR expires_at > CURRENT_TIMESTAMP())
+    )
+    ORDER BY chunk
+    LIMIT 1;
+
+    MERGE {table} T
+    USING claimed S
+    ON T.job_id = @job_id AND T.chunk = S.chunk
+    WHEN MATCHED THEN
+    UPDATE SET owner = @owner, expires_at = {expires_at}, done = FALSE
+    WHEN NOT MATCHED THEN
+    INSERT (job_id, chunk, owner, expires_at, done)
+    VALUES (@job_id, S.chunk, @owner, {expires_at}, FALSE);
+
+    COMMIT TRANSACTION;
+
+    SELECT chunk, expires_at
+    FROM {table}
+    WHERE job_id = @job_id AND owner = @owner AND NOT done
+    AND expires_at > CURRENT_TIMESTAMP();
+    """
+
+    return Query(
+        sql,
+        [
+            _param("job_id", "STRING", job_id),
+            _param("owner", "STRING", owner),
+            _param("num_chunks", "INT64", num_chunks),
+            _param("ttl", "INT64", ttl),
+        ],
+        name="claim_lease",
+    )
+
+
+def query_renew_lease(job_id: str, chunk: int, owner: str, ttl: int) -> Query:
+    sql = f"""
+    UPDATE `{PROJECT_ID}.{VINTED_DATASET_ID}.{LEASE_TABLE_ID}`
+    SET expires_at = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL @ttl SECOND)
+    WHERE job_id = @job_id AND chunk = @chunk AND owner = @owner AND NOT done
+    """
+
+    return Query(
+        sql,
+        [
+            _param("job_id", "STRING", job_id),
+            _param("chunk", "INT64", chunk),
+            _param("owner", "STRING", owner),
+            _param("ttl", "INT64", ttl),
+        ],
+        name="renew_lease",
+    )
+
+
+def query_complete_lease(job_id: str, chunk: int, owner: str) -> Query:
+    sql = f"""
+    UPDATE `{PROJECT_ID}.{VINTED_DATASET_ID}.{LEASE_TABLE_ID}`
+    SET done = TRUE
+    WHERE job_id = @job_id AND chunk = @chunk AND owner = @owner
+    """
+
+    return Query(
+        sql,
+        [
+            _param("job_id", "STRING", job_id),
+            _param("chunk", "INT64", chunk),
+            _param("owner", "STRING", owner),
+        ],
+        name="complete_lease",
+    )
+
+
+def refresh_candidates(client: bigquery.Client) -> bool:
+    cursor = get_job_cursor(client, CANDIDATE_TABLE_ID) or {}
+    window = timedelta(seconds=CANDIDATE_REFRESH_WINDOW)
+    previous, since = {}, {}
+
+    for key in ("created_at", "sold_at"):
+        value = cursor.get(key)
+        previous[key] = datetime.fromisoformat(value) if value else EPOCH
+        since[key] = previous[key] - window if value else EPOCH
+
+    try:
+        rows = execute(
+            client, query_refresh_candidates(since["created_at"], since["sold_at"])
+        ).result()
+    except Exception as e:
+        print(e)
+        return False
+
+    for row in rows:
+        cursor = {
+            "created_at": _to_isoformat(row.created_at, previous["created_at"]),
+            "sold_at": _to_isoformat(row.sold_at, previous["sold_at"]),
+        }
+
+    return update_job_cursor(client, CANDIDATE_TABLE_ID, cursor)
+
+
+def query_refresh_candidates(created_since: datetime, sold_since: datetime) -> Query:
+    table = f"`{PROJECT_ID}.{VINTED_DATASET_ID}.{CANDIDATE_TABLE_ID}`"
+    source = f"""
+    SELECT
+        i.id, p.point_id, i.vinted_id, i.url, i.user_id,
+        i.created_at, i.num_likes, i.brand, i.women
+    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_ACTIVE_TABLE_ID}` i
+    INNER JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` AS p ON i.id = p.item_id
+    LEFT JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}` AS s USING (vinted_id)
+    WHERE s.vinted_id IS NULL
+    """
+
+    sql = f"""
+    CREATE TABLE IF NOT EXISTS {table}
+    PARTITION BY DATE(created_at)
+    CLUSTER BY brand, women, created_at, num_likes AS
+    {source};
+
+    MERGE {table} T
+    USING ({source} AND i.created_at >= @created_since) S
+    ON T.id = S.id AND T.point_id = S.point_id AND T.created_at >= @created_since
+    WHEN NOT MATCHED BY TARGET THEN INSERT ROW;
+
+    DELETE FROM {table}
+    WHERE vinted_id IN (
+        SELECT vinted_id
+        FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}`
+        WHERE updated_at >= @sold_since
+    );
+
+    SELECT
+        (SELECT MAX(created_at) FROM {table} WHERE created_at >= @created_since)
+            AS created_at,
+        (
+            SELECT MAX(updated_at)
+            FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}`
+            WHERE updated_at >= @sold_since
+        ) AS sold_at;
+    """
+
+    return Query(
+        sql,
+        [
+            _param("created_since", "TIMESTAMP", created_since),
+            _param("sold_since", "TIMESTAMP", sold_since),
+        ],
+        name="refresh_candidates",
+    )
+
+
+def query_remove_orphan_candidates() -> Query:
+    sql = f"""
+    DELETE FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{CANDIDATE_TABLE_ID}` T
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_ACTIVE_TABLE_ID}` i
+        INNER JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` AS p ON i.id = p.item_id
+        WHERE i.id = T.id AND p.point_id = T.point_id
+    )
+    """
+
+    return Query(sql, name="remove_orphan_candidates")
+
+
 def query_items(
     only_top_brands: bool = False,
     only_vintage_dressing: bool = False,
@@ -77,7 +509,13 @@ def query_items(
     n: Optional[int] = None,
     index: Optional[int] = None,
     is_women: Optional[bool] = None,
-) -> str:
+    with_user_id: bool = False,
+    with_features: bool = False,
+    partition: Optional[Tuple[int, int]] = None,
+    keyset: bool = False,
+    after: Optional[Dict] = None,
+    from_candidates: bool = False,
+) -> Query:
     if only_vintage_dressing and only_top_brands:
         raise ValueError(
             "Cannot set both only_vintage_dressing and only_top_brands to True"
@@ -86,30 +524,128 @@ def query_items(
     if sort_by_date and sort_by_likes:
         raise ValueError("Cannot set both sort_by_date and sort_by_likes to True")
 
-    order_by_prefix = " ORDER BY"
-    where_prefix = "\nAND"
+    with_limit = bool(n) and (keyset or index is not None)
+
+    sql = _compile_items(
+        only_top_brands=only_top_brands,
+        only_vintage_dressing=only_vintage_dressing,
+        sort_by_date=sort_by_date,
+        sort_by_likes=sort_by_likes,
+        with_item_ids=bool(item_ids),
+        with_limit=with_limit,
+        with_women=is_women is not None,
+        with_partition=partition is not None,
+        with_user_id=with_user_id,
+        with_features=with_features,
+        keyset=keyset,
+        with_after=keyset and bool(after),
+        from_candidates=from_candidates,
+    )
 
-    query = f"""
-    SELECT i.id, p.point_id, i.vinted_id, i.url
-    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_ACTIVE_TABLE_ID}` i
-    INNER JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` AS p ON i.id = p.item_id
-    LEFT JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}` AS s USING (vinted_id)
-    WHERE s.vinted_id IS NULL
-    """
+    parameters = []
 
     if is_women is not None:
-        query += f"{where_prefix} women = {is_women}"
+        parameters.append(_param("is_women", "BOOL", is_women))
+
+    if partition is not None:
+        parameters.append(_param("bucket", "INT64", partition[0]))
+        parameters.append(_param("num_buckets", "INT64", partition[1]))
 
     if item_ids:
-        item_ids_str = ", ".join(f"'{item_id}'" for item_id in item_ids)
-        query += f"{where_prefix} id IN ({item_ids_str})"
+        parameters.append(_array("item_ids", "STRING", [str(i) for i in item_ids]))
+
+    if only_top_brands:
+        parameters.append(_array("brands", "STRING", TOP_BRANDS))
+
+    if only_vintage_dressing:
+        parameters.append(_param("brand", "STRING", VINTAGE_DRESSING_BRAND))
+
+    if keyset and after:
+        key_columns, _ = get_keyset_order(sort_by_date, sort_by_likes)
+        parameters.extend(_after_params(key_columns, after))
+
+    if with_limit:
+        parameters.append(_param("n", "INT64", n))
+
+        if not keyset:
+            parameters.append(_param("offset", "INT64", index * n))
+
+    return Query(sql, parameters, name="items")
+
+
+@lru_cache(maxsize=QUERY_TEMPLATE_CACHE_SIZE)
+def _compile_items(
+    only_top_brands: bool,
+    only_vintage_dressing: bool,
+    sort_by_date: bool,
+    sort_by_likes: bool,
+    with_item_ids: bool,
+    with_limit: bool,
+    with_women: bool,
+    with_partition: bool,
+    with_user_id: bool,
+    with_features: bool,
+    keyset: bool,
+    with_after: bool,
+    from_candidates: bool,
+) -> str:
+    order_by_prefix = " ORDER BY"
+    where_prefix = "\nAND"
+    point_id = "i.point_id" if from_candidates else "p.point_id"
+    columns = ["i.id", point_id, "i.vinted_id", "i.url"]
+
+    if with_user_id:
+        columns.append("i.user_id")
+
+    if with_features:
+        columns.extend(["i.created_at", "i.num_likes", "i.brand"])
+
+    key_columns, direction = get_keyset_order(sort_by_date, sort_by_likes)
+
+    if keyset:
+        columns.extend(f"i.{c}" for c in key_columns if f"i.{c}" not in columns)
+
+    if from_candidates:
+        query = f"""
+        SELECT {", ".join(columns)}
+        FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{CANDIDATE_TABLE_ID}` i
+        WHERE TRUE
+        """
+    else:
+        query = f"""
+        SELECT {", ".join(columns)}
+        FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_ACTIVE_TABLE_ID}` i
+        INNER JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` AS p ON i.id = p.item_id
+        LEFT JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}` AS s USING (vinted_id)
+        WHERE s.vinted_id IS NULL
+        """
+
+    if with_women:
+        query += f"{where_prefix} women = @is_women"
+
+    if with_partition:
+        query += f"{where_prefix} {_hash_bucket('i.id')}"
+
+    if with_item_ids:
+        query += f"{where_prefix} id IN UNNEST(@item_ids)"
 
     if only_top_brands:
-        top_brands_str = ", ".join(f'"{brand}"' for brand in TOP_BRANDS)
-        query += f"{where_prefix} brand IN ({top_brands_str})"
+        query += f"{where_prefix} brand IN UNNEST(@brands)"
 
     if only_vintage_dressing:
-        query += f"{where_prefix} brand = '{VINTAGE_DRESSING_BRAND}'"
+        query += f"{where_prefix} brand = @brand"
+
+    if keyset:
+        if with_after:
+            query += f"{where_prefix} {_seek(key_columns, direction)}"
+
+        order_by = ", ".join(f"i.{column} {direction}" for column in key_columns)
+        query += f"\nORDER BY {order_by}"
+
+        if with_limit:
+            query += "\nLIMIT @n"
+
+        return query
 
     if sort_by_date:
         query += f"\nORDER BY created_at DESC"
@@ -118,37 +654,68 @@ def query_items(
     if sort_by_likes:
         query += f" {order_by_prefix} num_likes DESC"
 
-    if n and index is not None:
-        query += f"\nLIMIT {n} OFFSET {index * n}"
+    if with_limit:
+        query += "\nLIMIT @n OFFSET @offset"
 
     return query
 
 
 def query_vector_ids(
-    n: Optional[int] = None, index: Optional[int] = None, shuffle: bool = False
-) -> str:
+    n: Optional[int] = None,
+    index: Optional[int] = None,
+    shuffle: bool = False,
+    sample: Optional[Tuple[int, int]] = None,
+) -> Query:
     query = f"""
     SELECT DISTINCT point_id
     FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}`
     """
 
+    if sample is not None:
+        query += f"WHERE {_hash_bucket('point_id')}"
+        return _sample(query, n, sample, name="vector_ids")
+
     if shuffle and index is None:
         query += "\nORDER BY RAND()"
 
-    if n:
-        query += f"\nLIMIT {n}"
-
-        if index:
-            query += f"\nOFFSET {index * n}"
-
-    return query
+    return _paginate(query, n, index, name="vector_ids")
 
 
 def query_interaction_items(
-    n: Optional[int] = None, index: Optional[int] = None, shuffle: bool = False
-) -> str:
+    n: Optional[int] = None,
+    index: Optional[int] = None,
+    shuffle: bool = False,
+    sample: Optional[Tuple[int, int]] = None,
+) -> Query:
     query = f"""
     SELECT DISTINCT p.point_id
+    {_interaction_points()}
+    """
+
+    if sample is not None:
+        query += f"WHERE {_hash_bucket('p.point_id')}"
+        return _sample(query, n, sample, name="interaction_items")
+
+    if shuffle:
+        query += "\nORDER BY RAND()"
+
+    return _paginate(query, n, index, name="interaction_items")
+
+
+def get_num_interaction_buckets(client: bigquery.Client, n: int) -> int:
+    query = Query(
+        f"SELECT COUNT(DISTINCT p.point_id) AS n {_interaction_points()}",
+        name="count_interaction_points",
+    )
+
+    for row in execute(client, query).result():
+        return max(1, math.ceil((row.n or 0) / n))
+
+    return 1
+
+
+def _interaction_points() -> str:
+    return f"""
     FROM (
     SELECT DISTINCT item_id FROM `{PROJECT_ID}.{PROD_DATASET_ID}.{CLICK_OUT_TABLE_ID}`
     UNION ALL
@@ -157,58 +724,210 @@ def query_interaction_items(
     INNER JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` AS p USING (item_id)
     """
 
-    if shuffle:
-        query += "\nORDER BY RAND()"
 
-    if n:
-        query += f"\nLIMIT {n}"
+def query_pinecone_points(item_ids: List[int]) -> Query:
+    sql = f"""
+    SELECT item_id, point_id
+    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}`
+    WHERE item_id IN UNNEST(@item_ids)
+    """
 
-        if index:
-            query += f"\nOFFSET {index * n}"
+    return Query(
+        sql,
+        [_array("item_ids", "STRING", [str(item_id) for item_id in item_ids])],
+        name="pinecone_points",
+    )
 
-    return query
 
+def query_sold_rates(lookback_days: int) -> Query:
+    sql = f"""
+    SELECT
+        RANGE_BUCKET(
+            DATE_DIFF(COALESCE(DATE(s.updated_at), CURRENT_DATE()), DATE(i.created_at), DAY),
+            @age_buckets
+        ) AS age_bucket,
+        RANGE_BUCKET(i.num_likes, @likes_buckets) AS likes_bucket,
+        i.brand,
+        COUNT(*) AS n,
+        COUNTIF(s.vinted_id IS NOT NULL) AS n_sold
+    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_TABLE_ID}` AS i
+    LEFT JOIN (
+        SELECT vinted_id, MIN(updated_at) AS updated_at
+        FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}`
+        GROUP BY vinted_id
+    ) AS s USING (vinted_id)
+    WHERE DATE(i.created_at) >= DATE_SUB(CURRENT_DATE(), INTERVAL @lookback_days DAY)
+    GROUP BY age_bucket, likes_bucket, brand
+    """
+
+    return Query(
+        sql,
+        [
+            _array("age_buckets", "INT64", AGE_DAYS_BUCKETS),
+            _array("likes_buckets", "INT64", NUM_LIKES_BUCKETS),
+            _param("lookback_days", "INT64", lookback_days),
+        ],
+        name="sold_rates",
+    )
 
-def query_pinecone_points(item_ids: List[int]) -> str:
-    item_ids_str = ", ".join([f"'{item_id}'" for item_id in item_ids])
 
-    return f"""
-    SELECT point_id 
-    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` 
-    WHERE item_id IN ({item_ids_str})
+def query_points_to_delete(cutoff: date, dated: bool = True) -> Query:
+    source = f"`{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}`"
+
+    if not dated:
+        source = f"({query_point_dates()})"
+
+    sql = f"""
+    SELECT DISTINCT point_id
+    FROM {source}
+    WHERE DATE(created_at) < @cutoff OR created_at IS NULL
     """
 
+    return Query(sql, [_param("cutoff", "DATE", cutoff)], name="points_to_delete")
 
-def query_points_to_delete(lookback_days: int) -> str:
-    return f"""
-    SELECT DISTINCT p.point_id
-    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` AS p
-    INNER JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_ACTIVE_TABLE_ID}` AS i ON p.item_id = i.id
-    WHERE DATE(i.created_at) < DATE_SUB(CURRENT_DATE(), INTERVAL {lookback_days} DAY);
+
+def query_partition_table(table_id: str, column: str, source: str) -> Query:
+    table = f"`{PROJECT_ID}.{VINTED_DATASET_ID}.{table_id}`"
+    partitioned = f"`{PROJECT_ID}.{VINTED_DATASET_ID}.{table_id}_partitioned`"
+
+    sql = f"""
+    CREATE TABLE {partitioned}
+    PARTITION BY DATE({column}) AS
+    {source};
+
+    DROP TABLE {table};
+
+    ALTER TABLE {partitioned} RENAME TO {table_id};
     """
 
+    return Query(sql, name="partition_table")
+
 
-def query_delete_points(lookback_days: int) -> bool:
+def query_point_dates() -> str:
     return f"""
-    CREATE OR REPLACE TABLE `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` AS
-    SELECT p.*
+    SELECT p.*, i.created_at
     FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` p
-    INNER JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_TABLE_ID}` i ON p.item_id = i.id
-    WHERE DATE(i.created_at) >= DATE_SUB(CURRENT_DATE(), INTERVAL {lookback_days} DAY)
+    LEFT JOIN `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_TABLE_ID}` i ON p.item_id = i.id
     """
 
 
-def query_delete_items(lookback_days: int) -> bool:
-    return f"""
-    DELETE FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_TABLE_ID}`
-    WHERE DATE(created_at) < DATE_SUB(CURRENT_DATE(), INTERVAL {lookback_days} DAY);
+def query_backfill_point_dates() -> Query:
+    sql = f"""
+    UPDATE `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` p
+    SET created_at = i.created_at
+    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_TABLE_ID}` i
+    WHERE p.created_at IS NULL AND p.item_id = i.id
     """
 
+    return Query(sql, name="backfill_point_dates")
 
-def query_delete_sold(lookback_days: int) -> bool:
-    return f"""
-    CREATE OR REPLACE TABLE `{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}` AS
-    SELECT *
-    FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}`
-    WHERE DATE(updated_at) >= DATE_SUB(CURRENT_DATE(), INTERVAL {lookback_days} DAY);
+
+def query_expire_rows(
+    table_id: str, column: str, cutoff: date, undated: bool = False
+) -> Query:
+    sql = f"""
+    DELETE FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{table_id}`
+    WHERE DATE({column}) < @cutoff
+    """
+
+    if undated:
+        sql += f"OR {column} IS NULL\n"
+
+    return Query(sql, [_param("cutoff", "DATE", cutoff)], name="expire_rows")
+
+
+def query_expire_undated_points(cutoff: date) -> Query:
+    sql = f"""
+    DELETE FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}` p
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{ITEM_TABLE_ID}` i
+        WHERE i.id = p.item_id AND DATE(i.created_at) >= @cutoff
+    )
     """
+
+    return Query(sql, [_param("cutoff", "DATE", cutoff)], name="expire_rows")
+
+
+def _hash_bucket(column: str) -> str:
+    return (
+        f"MOD(ABS(FARM_FINGERPRINT(CAST({column} AS STRING))), @num_buckets) "
+        "= @bucket"
+    )
+
+
+def get_keyset_order(
+    sort_by_date: bool = False, sort_by_likes: bool = False
+) -> Tuple[List[str], str]:
+    if sort_by_date:
+        return ["created_at", "id"], "DESC"
+
+    if sort_by_likes:
+        return ["num_likes", "id"], "DESC"
+
+    return ["created_at", "id"], "ASC"
+
+
+def _seek(columns: List[str], direction: str) -> str:
+    operator = "<" if direction == "DESC" else ">"
+    clauses = []
+
+    for k, column in enumerate(columns):
+        conditions = [f"i.{c} = @after_{c}" for c in columns[:k]]
+        conditions.append(f"i.{column} {operator} @after_{column}")
+        clauses.append(f"({' AND '.join(conditions)})")
+
+    return f"({' OR '.join(clauses)})"
+
+
+def _after_params(columns: List[str], after: Dict) -> List:
+    parameters = []
+
+    for column in columns:
+        value, type_ = after[column], KEY_COLUMN_TYPES[column]
+
+        if type_ == "TIMESTAMP" and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+
+        parameters.append(_param(f"after_{column}", type_, value))
+
+    return parameters
+
+
+def _to_isoformat(value: Optional[datetime], default: datetime) -> str:
+    return max(value or default, default).isoformat()
+
+
+def _paginate(
+    query: str, n: Optional[int], index: Optional[int], name: str
+) -> Query:
+    parameters = []
+
+    if n:
+        query += "\nLIMIT @n"
+        parameters.append(_param("n", "INT64", n))
+
+        if index:
+            query += "\nOFFSET @offset"
+            parameters.append(_param("offset", "INT64", index * n))
+
+    return Query(query, parameters, name=name)
+
+
+def _sample(
+    query: str, n: Optional[int], sample: Tuple[int, int], name: str
+) -> Query:
+    bucket, num_buckets = sample
+    query = _paginate(query, n, None, name=name)
+    query.parameters.append(_param("bucket", "INT64", bucket))
+    query.parameters.append(_param("num_buckets", "INT64", num_buckets))
+
+    return query
+
+
+def _param(name: str, type_: str, value: Any) -> bigquery.ScalarQueryParameter:
+    return bigquery.ScalarQueryParameter(name, type_, value)
+
+
+def _array(name: str, type_: str, values: List) -> bigquery.ArrayQueryParameter:
+    return bigquery.ArrayQueryParameter(name, type_, list(values))
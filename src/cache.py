@@ -0,0 +1,173 @@
+from typing import Dict, Iterable, List, Optional
+import os, sqlite3, sys, threading, time
+
+from google.cloud import bigquery
+
+from .bigquery import query_pinecone_points, run_query
+from .enums import STATE_DIR
+from .models import ItemStatus
+
+
+STATUS_CACHE_PATH = os.getenv(
+    "STATUS_CACHE_PATH", os.path.join(STATE_DIR, "status_cache.db")
+)
+STATUS_CACHE_TTL = 6 * 60 * 60
+STATUS_CACHE_MAX_SIZE = 1_000_000
+STATUS_CACHE_EVICT_EVERY = 1000
+POINT_MAP_CHUNK_SIZE = 10_000
+
+
+class StatusCache:
+    def __init__(
+        self,
+        path: str = STATUS_CACHE_PATH,
+        ttl: float = STATUS_CACHE_TTL,
+        max_size: int = STATUS_CACHE_MAX_SIZE,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS status (
+                vinted_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                observed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS status_observed_at ON status (observed_at)"
+        )
+
+    def get(self, vinted_id: str) -> Optional[ItemStatus]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, observed_at FROM status WHERE vinted_id = ?",
+                (str(vinted_id),),
+            ).fetchone()
+
+            if (
+                row
+                and row[0] == ItemStatus.AVAILABLE.value
+                and time.time() - row[1] < self.ttl
+            ):
+                self.hits += 1
+                return ItemStatus.AVAILABLE
+
+            self.misses += 1
+            return None
+
+    def observed_at(self, vinted_id: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT observed_at FROM status WHERE vinted_id = ?",
+                (str(vinted_id),),
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def put(self, vinted_id: str, status: ItemStatus) -> None:
+        if status == ItemStatus.UNKNOWN:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO status VALUES (?, ?, ?)",
+                (str(vinted_id), status.value, time.time()),
+            )
+            self._writes += 1
+
+            if self._writes % STATUS_CACHE_EVICT_EVERY == 0:
+                self._evict()
+
+    def close(self) -> None:
+        with self._lock:
+            self._evict()
+            self._conn.close()
+
+    def _evict(self) -> None:
+        (size,) = self._conn.execute("SELECT COUNT(*) FROM status").fetchone()
+
+        if size <= self.max_size:
+            return
+
+        self._conn.execute(
+            """
+            DELETE FROM status WHERE vinted_id IN (
+                SELECT vinted_id FROM status ORDER BY observed_at LIMIT ?
+            )
+            """,
+            (size - self.max_size,),
+        )
+
+
+class PointIdMap:
+    def __init__(
+        self, client: bigquery.Client, chunk_size: int = POINT_MAP_CHUNK_SIZE
+    ):
+        self.client = client
+        self.chunk_size = chunk_size
+
+        self.hits = 0
+        self.misses = 0
+        self._points: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def preload(self, item_ids: Iterable[str]) -> int:
+        with self._lock:
+            missing = list(
+                dict.fromkeys(
+                    str(item_id)
+                    for item_id in item_ids
+                    if str(item_id) not in self._points
+                )
+            )
+
+        for start in range(0, len(missing), self.chunk_size):
+            self._fetch(missing[start : start + self.chunk_size])
+
+        return len(self._points)
+
+    def lookup(self, item_ids: List[str]) -> List[str]:
+        item_ids = [str(item_id) for item_id in item_ids]
+
+        with self._lock:
+            missing = [item_id for item_id in item_ids if item_id not in self._points]
+            self.hits += len(item_ids) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            self.preload(missing)
+
+        with self._lock:
+            return [
+                self._points[item_id] for item_id in item_ids if item_id in self._points
+            ]
+
+    def _fetch(self, item_ids: List[str]) -> None:
+        try:
+            rows = run_query(self.client, query_pinecone_points(item_ids), to_list=False)
+            points = {
+                sys.intern(str(row.item_id)): sys.intern(row.point_id) for row in rows
+            }
+        except Exception as e:
+            print(e)
+            return
+
+        with self._lock:
+            self._points.update(points)
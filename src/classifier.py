@@ -0,0 +1,156 @@
+from typing import Optional, Union
+import html, re
+
+from .enums import *
+from .models import PageClass
+
+
+RawContent = Union[str, bytes]
+
+AMBIGUOUS = object()
+
+
+def _tag(name: str) -> bytes:
+    return b"(?i:" + re.escape(name.encode()) + b")"
+
+
+_TAG_START = re.compile(rb"<([a-zA-Z][a-zA-Z0-9]*)\b")
+
+_RATE_LIMIT_MESSAGE = re.compile(re.escape(RATE_LIMIT_MESSAGE.encode()), re.I)
+_RATE_LIMIT_HEADING = re.compile(
+    rb"<" + _tag(RATE_LIMIT_CONTAINER) + rb"\b[^>]*>([^<&]*)</"
+    + _tag(RATE_LIMIT_CONTAINER) + rb">"
+)
+
+_WAIT_HEADING = re.compile(
+    rb"<" + _tag(WAIT_HEADER_TYPE) + rb"\b[^>]*>"
+    + re.escape(WAIT_HEADER_TEXT.encode()) + rb"</"
+    + _tag(WAIT_HEADER_TYPE) + rb">"
+)
+_WAIT_VERIFICATION = re.compile(
+    rb"<" + _tag("p") + rb"\b[^>]*>[^<&]*"
+    + re.escape(WAIT_VERIFICATION_TEXT.encode()) + rb"[^<&]*</" + _tag("p") + rb">"
+)
+
+_SOLD_MARKER = b'data-testid="' + SOLD_CONTAINER_ATTRS["data-testid"].encode() + b'"'
+_SOLD_TAG = re.compile(
+    rb"<" + _tag(SOLD_CONTAINER_TYPE) + rb"\b[^<>]*" + re.escape(_SOLD_MARKER)
+    + rb"[^<>]*>([^<]*)</" + _tag(SOLD_CONTAINER_TYPE) + rb">"
+)
+
+_NOT_FOUND_MARKER = b'class="' + NOT_FOUND_CONTAINER_CLASS.encode() + b'"'
+_NOT_FOUND_TAG = re.compile(
+    rb"<" + _tag(NOT_FOUND_CONTAINER_TYPE) + rb"\b[^<>]*"
+    + re.escape(_NOT_FOUND_MARKER) + rb"[^<>]*>([^<]*)</"
+    + _tag(NOT_FOUND_CONTAINER_TYPE) + rb">"
+)
+
+
+def classify_page(raw_content: RawContent) -> Optional[PageClass]:
+    if isinstance(raw_content, str):
+        raw_content = raw_content.encode("utf-8")
+
+    if not isinstance(raw_content, bytes):
+        return None
+
+    checks = [
+        (_is_rate_limited, PageClass.RATE_LIMITED),
+        (_is_wait_page, PageClass.WAIT),
+        (_is_sold, PageClass.SOLD),
+        (_is_not_found, PageClass.NOT_FOUND),
+    ]
+
+    for check, page_class in checks:
+        result = check(raw_content)
+
+        if result is AMBIGUOUS:
+            return None
+
+        if result:
+            return page_class
+
+    return PageClass.AVAILABLE
+
+
+def _is_rate_limited(raw_content: bytes):
+    if not _RATE_LIMIT_MESSAGE.search(raw_content):
+        return False
+
+    for match in _RATE_LIMIT_HEADING.finditer(raw_content):
+        if _RATE_LIMIT_MESSAGE.search(match.group(1)):
+            return True
+
+    return AMBIGUOUS
+
+
+def _is_wait_page(raw_content: bytes):
+    header = WAIT_HEADER_TEXT.encode()
+    verification = WAIT_VERIFICATION_TEXT.encode()
+
+    if header not in raw_content or verification not in raw_content:
+        return False
+
+    if _WAIT_HEADING.search(raw_content) and _WAIT_VERIFICATION.search(raw_content):
+        return True
+
+    return AMBIGUOUS
+
+
+def _is_sold(raw_content: bytes):
+    text = _find_first_tag_text(
+        raw_content, _SOLD_MARKER, SOLD_CONTAINER_TYPE, _SOLD_TAG
+    )
+
+    if text is None:
+        return False
+
+    if text is AMBIGUOUS:
+        return AMBIGUOUS
+
+    return text.strip() == SOLD_STATUS_CONTENT
+
+
+def _is_not_found(raw_content: bytes):
+    text = _find_first_tag_text(
+        raw_content, _NOT_FOUND_MARKER, NOT_FOUND_CONTAINER_TYPE, _NOT_FOUND_TAG
+    )
+
+    if text is None:
+        return False
+
+    if text is AMBIGUOUS:
+        return AMBIGUOUS
+
+    return text.strip() == NOT_FOUND_STATUS_CONTENT
+
+
+def _find_first_tag_text(
+    raw_content: bytes, marker: bytes, tag: str, pattern: re.Pattern
+):
+    position = raw_content.find(marker)
+
+    while position != -1:
+        start = raw_content.rfind(b"<", 0, position)
+
+        if start == -1 or b">" in raw_content[start:position]:
+            return AMBIGUOUS
+
+        name = _TAG_START.match(raw_content, start)
+
+        if name is None:
+            return AMBIGUOUS
+
+        if name.group(1).lower() == tag.encode():
+            match = pattern.match(raw_content, start)
+
+            if match is None:
+                return AMBIGUOUS
+
+            try:
+                return html.unescape(match.group(1).decode("utf-8"))
+            except UnicodeDecodeError:
+                return AMBIGUOUS
+
+        position = raw_content.find(marker, position + len(marker))
+
+    return None
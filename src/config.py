@@ -4,12 +4,11 @@ import random
 from google.cloud import bigquery
 from pinecone import Pinecone
 from supabase import Client
-from selenium.webdriver.chrome.webdriver import WebDriver
 
 from .models import RunnerMode, JobConfig
 from .vinted.client import Vinted
 from .bigquery import init_bigquery_client
-from .driver import init_webdriver
+from .driver import DriverPool
 from .supabase import init_supabase_client
 from .enums import PINECONE_INDEX_NAME
 
@@ -20,7 +19,7 @@ def init_clients(
     bigquery.Client,
     Pinecone.Index,
     Vinted,
-    Optional[WebDriver],
+    Optional[DriverPool],
     Optional[Client],
 ]:
     gcp_credentials = secrets.get("GCP_CREDENTIALS")
@@ -32,9 +31,9 @@ def init_clients(
     vinted_client = Vinted()
 
     if mode == "api":
-        driver = None
+        driver_pool = None
     else:
-        driver = init_webdriver()
+        driver_pool = DriverPool()
 
     if with_supabase:
         supabase_client = init_supabase_client(
@@ -43,14 +42,14 @@ def init_clients(
     else:
         supabase_client = None
 
-    return bq_client, pinecone_index, vinted_client, driver, supabase_client
+    return bq_client, pinecone_index, vinted_client, driver_pool, supabase_client
 
 
 def init_config(
     bq_client: bigquery.Client,
     pinecone_index: Pinecone.Index,
     vinted_client: Vinted,
-    driver: Optional[WebDriver] = None,
+    driver_pool: Optional[DriverPool] = None,
     supabase_client: Optional[Client] = None,
     top_brands_alpha: float = 0.0,
     vintage_dressing_alpha: float = 0.0,
@@ -59,6 +58,7 @@ def init_config(
     is_women_alpha: float = 0.0,
     from_interactions: bool = False,
     from_saved: bool = False,
+    seed: Optional[str] = None,
 ) -> JobConfig:
     if from_saved:
         if not supabase_client:
@@ -67,18 +67,28 @@ def init_config(
         if from_interactions:
             raise ValueError("from_interactions is not supported for from_saved mode")
 
-    only_top_brands = random.random() < top_brands_alpha
-    only_vintage_dressing = random.random() < vintage_dressing_alpha
-    sort_by_likes = random.random() < sort_by_likes_alpha
-    sort_by_date = random.random() < sort_by_date_alpha
-    is_women = random.random() < is_women_alpha
+    rng = random.Random(seed)
+
+    only_top_brands = rng.random() < top_brands_alpha
+    only_vintage_dressing = rng.random() < vintage_dressing_alpha
+    sort_by_likes = rng.random() < sort_by_likes_alpha
+    sort_by_date = rng.random() < sort_by_date_alpha
+    is_women = rng.random() < is_women_alpha
+
+    if only_top_brands and only_vintage_dressing:
+        only_top_brands = rng.random() < 0.5
+        only_vintage_dressing = not only_top_brands
+
+    if sort_by_date and sort_by_likes:
+        sort_by_date = rng.random() < 0.5
+        sort_by_likes = not sort_by_date
 
     config = JobConfig(
         bq_client=bq_client,
         supabase_client=supabase_client,
         pinecone_index=pinecone_index,
         vinted_client=vinted_client,
-        driver=driver,
+        driver_pool=driver_pool,
         only_top_brands=only_top_brands,
         only_vintage_dressing=only_vintage_dressing,
         sort_by_likes=sort_by_likes,
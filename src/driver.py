@@ -1,8 +1,21 @@
-import random, time
+from typing import Dict, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import os, queue, random, threading, time
 from selenium.webdriver import Chrome
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.webdriver import WebDriver
 
+from .enums import INITIAL_SLEEP_TIME
+
+
+DRIVER_POOL_SIZE = 2
+DRIVER_MAX_PAGES = 500
+DRIVER_MAX_MEMORY_MB = 1024
+DRIVER_MEMORY_CHECK_EVERY = 50
+DRIVER_LEASE_TIMEOUT = 120
+DRIVER_LAUNCH_RETRIES = 3
+
 
 def init_webdriver(headless: bool = True) -> WebDriver:
     chrome_options = Options()
@@ -33,3 +46,147 @@ def gaussian_sleep(driver: WebDriver, mean: float = 1, std: float = 0.5) -> None
 
     if driver:
         driver.execute_script("window.scrollBy(0, 100);")
+
+
+class DriverPool:
+    def __init__(
+        self,
+        size: int = DRIVER_POOL_SIZE,
+        max_pages: int = DRIVER_MAX_PAGES,
+        max_memory_mb: float = DRIVER_MAX_MEMORY_MB,
+        headless: bool = True,
+    ):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.headless = headless
+
+        self._idle = queue.Queue()
+        self._pages: Dict[WebDriver, int] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            for driver in executor.map(lambda _: self._launch(), range(size)):
+                if driver:
+                    self._add(driver)
+
+    @contextmanager
+    def lease(self, timeout: float = DRIVER_LEASE_TIMEOUT) -> Iterator[WebDriver]:
+        driver = self._idle.get(timeout=timeout)
+        healthy = True
+
+        try:
+            yield driver
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            self._release(driver, healthy)
+
+    def close(self) -> None:
+        self._closed = True
+
+        with self._lock:
+            drivers = list(self._pages)
+            self._pages.clear()
+
+        for driver in drivers:
+            _quit(driver)
+
+    def _release(self, driver: WebDriver, healthy: bool) -> None:
+        with self._lock:
+            pages = self._pages.get(driver, 0) + 1
+            self._pages[driver] = pages
+
+        if self._closed:
+            return
+
+        recycle = not healthy or not is_alive(driver) or pages >= self.max_pages
+
+        if not recycle and pages % DRIVER_MEMORY_CHECK_EVERY == 0:
+            recycle = get_memory_mb(driver) > self.max_memory_mb
+
+        if recycle:
+            threading.Thread(target=self._replace, args=(driver,), daemon=True).start()
+        else:
+            self._idle.put(driver)
+
+    def _replace(self, driver: WebDriver) -> None:
+        with self._lock:
+            self._pages.pop(driver, None)
+
+        _quit(driver)
+
+        for attempt in range(DRIVER_LAUNCH_RETRIES):
+            if self._closed:
+                return
+
+            new_driver = self._launch()
+
+            if new_driver:
+                self._add(new_driver)
+                return
+
+            time.sleep(INITIAL_SLEEP_TIME * (attempt + 1))
+
+    def _add(self, driver: WebDriver) -> None:
+        with self._lock:
+            self._pages[driver] = 0
+
+        self._idle.put(driver)
+
+    def _launch(self) -> Optional[WebDriver]:
+        try:
+            return init_webdriver(self.headless)
+        except Exception as e:
+            print(e)
+            return None
+
+
+def is_alive(driver: WebDriver) -> bool:
+    try:
+        driver.window_handles
+        return True
+    except Exception:
+        return False
+
+
+def get_memory_mb(driver: WebDriver) -> float:
+    try:
+        pids = [driver.service.process.pid]
+    except AttributeError:
+        return 0.0
+
+    total_kb, seen = 0, set()
+
+    while pids:
+        pid = pids.pop()
+
+        if pid in seen:
+            continue
+
+        seen.add(pid)
+
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+
+        except (OSError, ValueError):
+            continue
+
+    return total_kb / 1024
+
+
+def _quit(driver: WebDriver) -> None:
+    try:
+        driver.quit()
+    except Exception:
+        pass
@@ -1,3 +1,5 @@
+import os
+
 PROJECT_ID = "recove-450509"
 VINTED_DATASET_ID = "vinted"
 PROD_DATASET_ID = "prod"
@@ -5,6 +7,8 @@ PROD_DATASET_ID = "prod"
 ITEM_TABLE_ID = "item"
 ITEM_ACTIVE_TABLE_ID = "item_active"
 INDEX_TABLE_ID = "item_active_index"
+LEASE_TABLE_ID = "item_active_lease"
+CANDIDATE_TABLE_ID = "item_candidate"
 SOLD_TABLE_ID = "sold"
 PINECONE_TABLE_ID = "pinecone"
 CLICK_OUT_TABLE_ID = "click_out"
@@ -27,12 +31,27 @@ REQUESTS_HEADERS = {
     "Upgrade-Insecure-Requests": "1",
 }
 
+PREFETCH_DEPTH = 2
+
+STATE_DIR = os.getenv("STATE_DIR", ".")
+
 MAX_RETRIES = 3
 INITIAL_SLEEP_TIME = 10
 MAX_SLEEP_TIME = 60
 RATE_LIMIT_SLEEP_TIME = 30
 INVALID_STATUS_CODES = [429, 403]
 
+WARDROBE_MAX_PAGES = 10
+
+AGE_DAYS_BUCKETS = [1, 3, 7, 14, 30]
+NUM_LIKES_BUCKETS = [1, 3, 10, 30]
+
+RATE_LIMIT_INITIAL_RATE = 2.0
+RATE_LIMIT_MIN_RATE = 0.2
+RATE_LIMIT_MAX_RATE = 10.0
+RATE_LIMIT_INCREASE = 0.1
+RATE_LIMIT_DECREASE_FACTOR = 0.5
+
 BS4_PARSER = "html.parser"
 SOLD_CONTAINER_TYPE = "div"
 SOLD_CONTAINER_ATTRS = {"data-testid": "item-status--content"}
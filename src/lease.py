@@ -0,0 +1,196 @@
+from typing import Iterator, Optional, Tuple
+from dataclasses import dataclass
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import os, random, socket, sqlite3, threading, time, uuid
+
+from google.cloud import bigquery
+
+from .models import StreamDataLoader
+from .bigquery import (
+    Query,
+    execute,
+    query_claim_lease,
+    query_renew_lease,
+    query_complete_lease,
+)
+
+
+LEASE_TTL = 15 * 60
+CLAIM_RETRIES = 5
+
+
+@dataclass
+class Lease:
+    job_id: str
+    chunk: int
+    num_chunks: int
+    owner: str
+    expires_at: datetime
+    lost: bool = False
+
+    @property
+    def partition(self) -> Tuple[int, int]:
+        return self.chunk, self.num_chunks
+
+
+class BigQueryLeaseStore:
+    def __init__(self, client: bigquery.Client, ttl: int = LEASE_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    def claim(self, job_id: str, owner: str, num_chunks: int) -> Optional[Lease]:
+        query = query_claim_lease(job_id, owner, num_chunks, self.ttl)
+
+        for attempt in range(CLAIM_RETRIES):
+            try:
+                for row in execute(self.client, query).result():
+                    return Lease(job_id, row.chunk, num_chunks, owner, row.expires_at)
+
+                return None
+
+            except Exception as e:
+                print(e)
+                time.sleep(random.uniform(1, 2**attempt))
+
+        return None
+
+    def renew(self, lease: Lease) -> bool:
+        query = query_renew_lease(lease.job_id, lease.chunk, lease.owner, self.ttl)
+        return self._update(query)
+
+    def complete(self, lease: Lease) -> bool:
+        query = query_complete_lease(lease.job_id, lease.chunk, lease.owner)
+        return self._update(query)
+
+    def _update(self, query: Query) -> bool:
+        try:
+            job = execute(self.client, query)
+            job.result()
+            return job.num_dml_affected_rows == 1
+        except Exception as e:
+            print(e)
+            return False
+
+
+class LocalLeaseStore:
+    def __init__(self, path: str, ttl: int = LEASE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lease (
+                job_id TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (job_id, chunk)
+            )
+            """
+        )
+
+    def claim(self, job_id: str, owner: str, num_chunks: int) -> Optional[Lease]:
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+
+            try:
+                (n_done,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM lease WHERE job_id = ? AND done",
+                    (job_id,),
+                ).fetchone()
+
+                if n_done >= num_chunks:
+                    self._conn.execute("DELETE FROM lease WHERE job_id = ?", (job_id,))
+
+                taken = {
+                    chunk
+                    for (chunk,) in self._conn.execute(
+                        "SELECT chunk FROM lease "
+                        "WHERE job_id = ? AND (done OR expires_at > ?)",
+                        (job_id, now),
+                    )
+                }
+                free = [chunk for chunk in range(num_chunks) if chunk not in taken]
+
+                if not free:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                expires_at = now + self.ttl
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO lease VALUES (?, ?, ?, ?, 0)",
+                    (job_id, free[0], owner, expires_at),
+                )
+                self._conn.execute("COMMIT")
+
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return Lease(
+            job_id,
+            free[0],
+            num_chunks,
+            owner,
+            datetime.fromtimestamp(expires_at, tz=timezone.utc),
+        )
+
+    def renew(self, lease: Lease) -> bool:
+        return self._update(
+            "UPDATE lease SET expires_at = ? "
+            "WHERE job_id = ? AND chunk = ? AND owner = ? AND NOT done",
+            (time.time() + self.ttl, lease.job_id, lease.chunk, lease.owner),
+        )
+
+    def complete(self, lease: Lease) -> bool:
+        return self._update(
+            "UPDATE lease SET done = 1 WHERE job_id = ? AND chunk = ? AND owner = ?",
+            (lease.job_id, lease.chunk, lease.owner),
+        )
+
+    def _update(self, query: str, params: tuple) -> bool:
+        with self._lock:
+            return self._conn.execute(query, params).rowcount == 1
+
+
+def get_owner() -> str:
+    task_index = os.getenv("CLOUD_RUN_TASK_INDEX", "0")
+    return f"{socket.gethostname()}-{task_index}-{uuid.uuid4().hex[:8]}"
+
+
+def until_lost(loader, lease: Lease) -> StreamDataLoader:
+    def entries():
+        for entry in loader:
+            if lease.lost:
+                print(f"Lost lease on chunk {lease.chunk}/{lease.num_chunks}")
+                return
+
+            yield entry
+
+    return StreamDataLoader(entries(), total_rows=loader.total_rows)
+
+
+@contextmanager
+def renewing(store, lease: Lease) -> Iterator[Lease]:
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(store.ttl / 3):
+            if not store.renew(lease):
+                lease.lost = True
+                return
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+
+    try:
+        yield lease
+    finally:
+        stop.set()
+        thread.join()
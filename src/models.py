@@ -1,14 +1,15 @@
-from typing import List, Iterator, Dict, Literal, Optional
+from typing import Any, Callable, Iterable, List, Iterator, Dict, Literal, Optional
 from dataclasses import dataclass, field
+from datetime import datetime
 from enum import Enum
 
 from random import random
 from google.cloud import bigquery
 from pinecone import Pinecone, ScoredVector
 from supabase import Client
-from selenium.webdriver.chrome.webdriver import WebDriver
 
 from .bigquery import get_job_index
+from .driver import DriverPool
 from .vinted.client import Vinted
 
 
@@ -22,6 +23,14 @@ class ItemStatus(Enum):
     UNKNOWN = "unknown"
 
 
+class PageClass(Enum):
+    AVAILABLE = "available"
+    SOLD = "sold"
+    NOT_FOUND = "not_found"
+    RATE_LIMITED = "rate_limited"
+    WAIT = "wait"
+
+
 @dataclass
 class JobConfig:
     bq_client: bigquery.Client
@@ -34,7 +43,7 @@ class JobConfig:
     from_interactions: bool
     from_saved: bool
     is_women: bool
-    driver: Optional[WebDriver] = None
+    driver_pool: Optional[DriverPool] = None
     supabase_client: Optional[Client] = None
 
     def __post_init__(self):
@@ -88,6 +97,7 @@ class PineconeEntry:
     point_id: str
     vinted_id: str
     url: str
+    user_id: Optional[str] = None
 
     @classmethod
     def from_vector(cls, vector: ScoredVector) -> "PineconeEntry":
@@ -96,6 +106,7 @@ class PineconeEntry:
             point_id=vector.id,
             vinted_id=vector.metadata["vinted_id"],
             url=vector.metadata["url"],
+            user_id=vector.metadata.get("user_id"),
         )
 
     @classmethod
@@ -105,6 +116,7 @@ class PineconeEntry:
             point_id=data["point_id"],
             vinted_id=data["vinted_id"],
             url=data["url"],
+            user_id=data.get("user_id"),
         )
 
 
@@ -127,3 +139,152 @@ class PineconeDataLoader:
     @property
     def total_rows(self) -> int:
         return len(self.entries)
+
+
+class StreamDataLoader:
+    def __init__(self, entries: Iterable[PineconeEntry], total_rows: int):
+        self.entries = entries
+        self.n_malformed = 0
+        self.n_missing = 0
+        self.n_failed = 0
+        self.failed_ids: List[str] = []
+        self._total_rows = total_rows
+
+    def __iter__(self) -> Iterator[PineconeEntry]:
+        return iter(self.entries)
+
+    @property
+    def total_rows(self) -> int:
+        skipped = self.n_malformed + self.n_missing + len(self.failed_ids)
+
+        return self._total_rows - skipped
+
+
+class ArrowDataLoader:
+    def __init__(
+        self,
+        batches: Iterable,
+        total_rows: int,
+        key_columns: Optional[List[str]] = None,
+        on_cursor: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ):
+        self.batches = batches
+        self.key_columns = key_columns or []
+        self.on_cursor = on_cursor
+        self.cursor: Optional[Dict[str, Any]] = None
+        self._total_rows = total_rows
+
+    def __iter__(self) -> Iterator[PineconeEntry]:
+        for columns in self.iter_batches():
+            user_ids = columns.get("user_id") or [None] * len(columns["id"])
+
+            for values in zip(
+                columns["id"],
+                columns["point_id"],
+                columns["vinted_id"],
+                columns["url"],
+                user_ids,
+            ):
+                yield PineconeEntry(*values)
+
+            self._set_cursor(columns)
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        for columns in self.iter_batches():
+            names = list(columns)
+
+            for values in zip(*columns.values()):
+                yield dict(zip(names, values))
+
+            self._set_cursor(columns)
+
+    def iter_batches(self) -> Iterator[Dict[str, List]]:
+        for batch in self.batches:
+            if batch.num_rows == 0:
+                continue
+
+            yield {
+                name: batch.column(i).to_pylist()
+                for i, name in enumerate(batch.schema.names)
+            }
+
+    @property
+    def total_rows(self) -> int:
+        return self._total_rows
+
+    def _set_cursor(self, columns: Dict[str, List]) -> None:
+        if self.key_columns:
+            self.cursor = {
+                column: _to_cursor_value(columns[column][-1])
+                for column in self.key_columns
+            }
+
+            if self.on_cursor:
+                self.on_cursor(self.cursor)
+
+
+def _to_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    return value
+
+
+@dataclass
+class UpdateBatch:
+    item_ids: List[str]
+    vinted_ids: List[str]
+    point_ids: List[str]
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+
+@dataclass
+class UpdateResult:
+    batch: UpdateBatch
+    supabase: Optional[bool] = None
+    pinecone: Optional[bool] = None
+    bigquery: Optional[bool] = None
+
+    @property
+    def sinks(self) -> Dict[str, bool]:
+        return {
+            sink: success
+            for sink, success in [
+                ("supabase", self.supabase),
+                ("pinecone", self.pinecone),
+                ("bigquery", self.bigquery),
+            ]
+            if success is not None
+        }
+
+    @property
+    def success(self) -> bool:
+        return bool(self.sinks) and all(self.sinks.values())
+
+
+@dataclass
+class DeleteReport:
+    n_ids: int = 0
+    n_deleted: int = 0
+    n_batches: int = 0
+    n_batches_deleted: int = 0
+    n_calls: int = 0
+    failed: List[str] = field(default_factory=list)
+
+    def add(self, batch: List[str], failed: List[str], n_calls: int) -> None:
+        self.n_ids += len(batch)
+        self.n_deleted += len(batch) - len(failed)
+        self.n_batches += 1
+        self.n_batches_deleted += int(not failed)
+        self.n_calls += n_calls
+        self.failed.extend(failed)
+
+    @property
+    def success_rate(self) -> float:
+        return self.n_deleted / self.n_ids if self.n_ids else 0.0
+
+    @property
+    def batch_success_rate(self) -> float:
+        return self.n_batches_deleted / self.n_batches if self.n_batches else 0.0
@@ -0,0 +1,162 @@
+from typing import Dict, List, Optional, Tuple
+from dataclasses import asdict
+import json, os, shutil, sqlite3, threading, time
+
+from .enums import STATE_DIR
+from .models import UpdateBatch, UpdateResult
+
+
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", os.path.join(STATE_DIR, "outbox.db"))
+OUTBOX_BACKUP_DIR = os.getenv("OUTBOX_BACKUP_DIR")
+OUTBOX_REPLAY_SIZE = 1000
+SINKS = ["supabase", "pinecone", "bigquery"]
+
+PENDING = 0
+APPLIED = 1
+
+
+class Outbox:
+    def __init__(
+        self, path: str = OUTBOX_PATH, backup_dir: Optional[str] = OUTBOX_BACKUP_DIR
+    ):
+        self.path = path
+        self.backup_dir = backup_dir
+        self._lock = threading.Lock()
+
+        restored = self._restore()
+
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mutation (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                applied_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                supabase INTEGER,
+                pinecone INTEGER,
+                bigquery INTEGER
+            )
+            """
+        )
+
+        if restored:
+            self._conn.execute(
+                "UPDATE mutation SET bigquery = ? WHERE bigquery = ?",
+                (PENDING, APPLIED),
+            )
+
+    def record(self, batch: UpdateBatch, sinks: List[str]) -> int:
+        flags = [PENDING if sink in sinks else None for sink in SINKS]
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO mutation "
+                "(batch, created_at, supabase, pinecone, bigquery) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (json.dumps(asdict(batch)), time.time(), *flags),
+            )
+            self._backup()
+
+        return cursor.lastrowid
+
+    def mark(self, ids: List[int], result: UpdateResult) -> None:
+        applied = [sink for sink, success in result.sinks.items() if success]
+        updates = "".join(f", {sink} = {APPLIED}" for sink in applied)
+
+        with self._lock:
+            self._conn.executemany(
+                f"UPDATE mutation SET attempts = attempts + 1, "
+                f"applied_at = ?{updates} WHERE id = ?",
+                [(time.time(), mutation_id) for mutation_id in ids],
+            )
+
+    def pending(
+        self, limit: int = OUTBOX_REPLAY_SIZE
+    ) -> List[Tuple[List[int], UpdateBatch, List[str]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, batch, supabase, pinecone, bigquery FROM mutation "
+                "WHERE supabase = ? OR pinecone = ? OR bigquery = ? ORDER BY id",
+                (PENDING, PENDING, PENDING),
+            ).fetchall()
+
+        groups: Dict[Tuple[str, ...], Tuple[List[int], UpdateBatch]] = {}
+        replays = []
+
+        for mutation_id, batch, *flags in rows:
+            sinks = tuple(s for s, flag in zip(SINKS, flags) if flag == PENDING)
+            batch = UpdateBatch(**json.loads(batch))
+            ids, merged = groups.setdefault(sinks, ([], UpdateBatch([], [], [])))
+
+            ids.append(mutation_id)
+            merged.item_ids.extend(batch.item_ids)
+            merged.vinted_ids.extend(batch.vinted_ids)
+            merged.point_ids.extend(batch.point_ids)
+
+            if len(merged) >= limit:
+                replays.append((ids, merged, list(sinks)))
+                del groups[sinks]
+
+        replays.extend(
+            (ids, merged, list(sinks)) for sinks, (ids, merged) in groups.items()
+        )
+
+        return replays
+
+    def compact(self, committed_at: Optional[float] = None) -> int:
+        committed_at = time.time() if committed_at is None else committed_at
+        applied = " AND ".join(f"({sink} IS NULL OR {sink} = ?)" for sink in SINKS)
+
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM mutation WHERE {applied} AND applied_at <= ?",
+                (APPLIED, APPLIED, APPLIED, committed_at),
+            )
+
+            if cursor.rowcount > 0:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._backup()
+
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._backup()
+            self._conn.close()
+
+    def _backup(self) -> None:
+        if not self.backup_dir:
+            return
+
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            path = os.path.join(self.backup_dir, os.path.basename(self.path))
+            destination = sqlite3.connect(path + ".tmp")
+
+            with destination:
+                self._conn.backup(destination)
+
+            destination.close()
+            os.replace(path + ".tmp", path)
+
+        except Exception as e:
+            print(e)
+
+    def _restore(self) -> bool:
+        if not self.backup_dir or os.path.exists(self.path):
+            return False
+
+        path = os.path.join(self.backup_dir, os.path.basename(self.path))
+
+        if not os.path.exists(path):
+            return False
+
+        shutil.copyfile(path, self.path)
+
+        return True
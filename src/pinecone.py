@@ -1,92 +1,160 @@
-from typing import List, Tuple
-
-import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+
+import random, time
 from tqdm import tqdm
 from google.cloud import bigquery
 
 from pinecone.data.index import Index, ScoredVector
-from .models import PineconeEntry, PineconeDataLoader
+from .models import DeleteReport, PineconeEntry, PineconeDataLoader, StreamDataLoader
+from .pipeline import prefetch
 
 
 BATCH_SIZE = 1000
 MAX_LIMIT = 100
 SLEEP_TIME = 30
+DELETE_WORKERS = 8
+FETCH_CHUNK_SIZE = 200
+FETCH_WORKERS = 4
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 2
+DELETE_RETRIES = 3
+DELETE_BACKOFF = 2
+DELETE_DEADLINE = 120
 
 
-def list_points(
-    index: Index,
-    n: int,
-) -> PineconeDataLoader:
-    ix, pagination_token = 0, None
-    loader = PineconeDataLoader()
+def list_points(index: Index, n: Optional[int] = None) -> StreamDataLoader:
+    if n is None:
+        n = index.describe_index_stats().total_vector_count
 
-    with tqdm(total=n, desc="Fetching vectors") as pbar:
-        while ix < n:
-            results = index.list_paginated(
-                limit=MAX_LIMIT, pagination_token=pagination_token
-            )
+    return StreamDataLoader(_iter_points(index, n), total_rows=n)
 
-            pagination_token = results.get("pagination", {}).get("next")
 
-            for vector in results.get("vectors", []):
-                entry = PineconeEntry.from_dict(vector)
-                loader.add(entry)
-                ix += 1
-                pbar.update(1)
+def _iter_points(index: Index, n: int) -> Iterator[PineconeEntry]:
+    ix = 0
 
-                if ix >= n:
-                    return loader
+    for point_ids in prefetch(_list_pages(index)):
+        for entry in fetch_vectors(index, point_ids):
+            yield entry
+            ix += 1
 
-    return loader
+            if ix >= n:
+                return
 
 
-def fetch_vectors(index: Index, point_ids: List[str]) -> PineconeDataLoader:
-    response = index.fetch(ids=point_ids)
-    loader = PineconeDataLoader()
+def _list_pages(index: Index) -> Iterator[List[str]]:
+    pagination_token = None
 
-    for vector in response.vectors.values():
-        try:
-            entry = PineconeEntry.from_vector(vector)
-            loader.add(entry)
-        except:
-            pass
+    while True:
+        results = index.list_paginated(
+            limit=MAX_LIMIT, pagination_token=pagination_token
+        )
 
-    return loader
+        point_ids = [vector["id"] for vector in results.get("vectors", [])]
 
+        if point_ids:
+            yield point_ids
 
-def delete_points_from_ids(
-    index: Index, ids: List[str], verbose: bool = False
-) -> Tuple[float, List[str]]:
-    if len(ids) == 0:
-        return False
+        pagination = results.get("pagination") or {}
+        pagination_token = pagination.get("next")
+
+        if not pagination_token:
+            return
+
+
+def fetch_vectors(
+    index: Index,
+    point_ids: List[str],
+    chunk_size: int = FETCH_CHUNK_SIZE,
+    num_workers: int = FETCH_WORKERS,
+    metadata_only: bool = True,
+) -> StreamDataLoader:
+    executor = ThreadPoolExecutor(max_workers=num_workers)
+    futures = {}
+
+    for i in range(0, len(point_ids), chunk_size):
+        chunk = point_ids[i : i + chunk_size]
+        futures[executor.submit(_fetch_chunk, index, chunk, metadata_only)] = chunk
 
-    iterator = range(0, len(ids), BATCH_SIZE)
-    n_success, failed = 0, []
+    executor.shutdown(wait=False)
 
-    if verbose:
-        iterator = tqdm(iterable=iterator, total=int(len(ids) // BATCH_SIZE))
+    loader = StreamDataLoader([], total_rows=len(point_ids))
+    loader.entries = _iter_fetched(futures, loader)
 
-    for i in iterator:
+    return loader
+
+
+def _fetch_chunk(
+    index: Index,
+    point_ids: List[str],
+    metadata_only: bool,
+    retries: int = FETCH_RETRIES,
+) -> Tuple[List[str], List]:
+    for attempt in range(retries):
         try:
-            batch = ids[i : i + BATCH_SIZE]
-            response = index.delete(ids=batch)
-            success = int(len(response) == 0)
+            response = index.fetch(ids=point_ids)
+            break
 
         except Exception as e:
+            if attempt == retries - 1:
+                raise
+
             print(e)
-            success = 0
-            failed.extend(batch)
+            time.sleep(random.uniform(0, FETCH_BACKOFF * 2**attempt))
 
-        n_success += success
-        success_rate = n_success / (i + 1)
+    vectors = list(response.vectors.values())
 
-        if not success:
-            time.sleep(SLEEP_TIME)
+    if metadata_only:
+        for vector in vectors:
+            vector.values = []
 
-        if verbose:
-            iterator.set_description(f"Success rate: {success_rate:.2f}")
+    return point_ids, vectors
+
+
+def _iter_fetched(
+    futures: Dict[Future, List[str]], loader: StreamDataLoader
+) -> Iterator[PineconeEntry]:
+    for future in as_completed(futures):
+        try:
+            _, vectors = future.result()
+        except Exception as e:
+            print(e)
+            loader.n_failed += 1
+            loader.failed_ids.extend(futures[future])
+            continue
 
-    return success_rate, failed
+        loader.n_missing += len(futures[future]) - len(vectors)
+        entries = []
+
+        for vector in vectors:
+            try:
+                entries.append(PineconeEntry.from_vector(vector))
+            except (KeyError, TypeError, AttributeError):
+                loader.n_malformed += 1
+
+        yield from entries
+
+    if loader.n_malformed or loader.n_missing or loader.n_failed:
+        print(
+            f"Fetch: {loader.n_malformed} malformed vectors | "
+            f"{loader.n_missing} missing points | "
+            f"{loader.n_failed} failed chunks"
+        )
+
+    if loader.failed_ids:
+        print(f"Failed to fetch {len(loader.failed_ids)} points: {loader.failed_ids}")
+
+
+def delete_points_from_ids(
+    index: Index, ids: List[str], verbose: bool = False
+) -> DeleteReport:
+    return delete_points(index=index, ids=ids, total=len(ids), verbose=verbose)
 
 
 def delete_points_from_bigquery_iterator(
@@ -95,47 +163,129 @@ def delete_points_from_bigquery_iterator(
     id_field: str,
     batch_size: int = BATCH_SIZE,
     verbose: bool = False,
-) -> Tuple[float, List[str]]:
-    total_rows = iterator.total_rows
-    if verbose:
-        iterator = tqdm(
-            iterable=enumerate(iterator),
-            total=total_rows,
+) -> DeleteReport:
+    return delete_points(
+        index=index,
+        ids=(dict(row).get(id_field) for row in iterator),
+        batch_size=batch_size,
+        total=iterator.total_rows,
+        verbose=verbose,
+    )
+
+
+def delete_points(
+    index: Index,
+    ids: Iterable[str],
+    batch_size: int = BATCH_SIZE,
+    num_workers: int = DELETE_WORKERS,
+    total: Optional[int] = None,
+    verbose: bool = False,
+) -> DeleteReport:
+    report = DeleteReport()
+    pbar = tqdm(total=total, desc="Deleting points", unit="id") if verbose else None
+    started_at = time.monotonic()
+
+    def collect(futures: Set[Future]) -> None:
+        for future in futures:
+            batch, failed, n_calls = future.result()
+            report.add(batch, failed, n_calls)
+
+            if pbar is not None:
+                pbar.update(len(batch))
+                pbar.set_postfix_str(
+                    f"{pbar.n / (time.monotonic() - started_at):,.0f} ids/s | "
+                    f"Success rate: {report.success_rate:.2f}"
+                )
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = set()
+
+        for batch in prefetch(_batched(ids, batch_size), depth=num_workers):
+            if len(pending) >= 2 * num_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            pending.add(executor.submit(_delete_batch, index, batch))
+
+        collect(wait(pending).done)
+
+    if pbar is not None:
+        pbar.close()
+
+    return report
+
+
+def _delete_batch(
+    index: Index, batch: List[str]
+) -> Tuple[List[str], List[str], int]:
+    deadline = time.monotonic() + DELETE_DEADLINE
+    failed, n_calls = [], 0
+    stack = [batch]
+
+    while stack:
+        ids = stack.pop()
+        success, calls, rejected = retry_mutation(
+            lambda: index.delete(ids=ids), deadline
         )
+        n_calls += calls
 
-    current_batch, failed, n, n_success = [], [], 0, 0
+        if success:
+            continue
 
-    for ix, row in iterator:
-        row = dict(row)
-        entry = row.get(id_field)
-        current_batch.append(entry)
+        if not rejected or len(ids) == 1 or time.monotonic() >= deadline:
+            failed.extend(ids)
+        else:
+            middle = len(ids) // 2
+            stack.extend([ids[middle:], ids[:middle]])
 
-        if len(current_batch) >= batch_size or n == total_rows - 1:
-            try:
-                response = index.delete(ids=current_batch)
-                success = int(len(response) == 0)
-
-            except Exception as e:
-                failed.extend(current_batch)
-                success = 0
-
-            n += 1
-            n_success += success
-            success_rate = n_success / n
-            current_batch = []
-
-            if not success:
-                time.sleep(SLEEP_TIME)
-
-            if verbose:
-                iterator.set_description(
-                    f"Batch: {n} | "
-                    f"Processed: {ix+1} | "
-                    f"Success: {n_success} | "
-                    f"Success rate: {success_rate:.2f}"
-                )
+    return batch, failed, n_calls
+
+
+def retry_mutation(
+    mutate: Callable[[], Dict],
+    deadline: float,
+    retries: int = DELETE_RETRIES,
+) -> Tuple[bool, int, bool]:
+    for attempt in range(retries):
+        try:
+            if len(mutate()) == 0:
+                return True, attempt + 1, False
+
+        except Exception as e:
+            print(e)
+
+            if _is_rejected(e):
+                return False, attempt + 1, True
+
+        remaining = deadline - time.monotonic()
+
+        if attempt == retries - 1 or remaining <= 0:
+            return False, attempt + 1, False
+
+        sleep_time = random.uniform(0, DELETE_BACKOFF * 2**attempt)
+        time.sleep(min(sleep_time, remaining))
+
+    return False, retries, False
+
+
+def _is_rejected(e: Exception) -> bool:
+    status = getattr(e, "status", None) or getattr(e, "status_code", None)
+
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+
+def _batched(ids: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    batch = []
+
+    for point_id in ids:
+        batch.append(point_id)
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
 
-    return success_rate, failed
+    if batch:
+        yield batch
 
 
 def get_neighbors(index: Index, point_id: str, n: int) -> PineconeDataLoader:
@@ -0,0 +1,81 @@
+from typing import Any, Callable, Iterable, Iterator, Tuple
+import queue, threading
+
+from .enums import PREFETCH_DEPTH
+
+
+def prefetch(iterable: Iterable, depth: int = PREFETCH_DEPTH) -> Iterator:
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+
+        except Exception as e:
+            put((False, e))
+            return
+
+        put((False, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            ok, item = buffer.get()
+
+            if not ok:
+                if item is not None:
+                    raise item
+
+                return
+
+            yield item
+
+    finally:
+        stop.set()
+
+
+class ChunkSource:
+    def __init__(
+        self,
+        load: Callable[[int], Any],
+        start: int = 0,
+        depth: int = PREFETCH_DEPTH,
+        wrap: bool = False,
+    ):
+        self.load = load
+        self.start = start
+        self.depth = depth
+        self.wrap = wrap
+
+    def __iter__(self) -> Iterator[Tuple[int, Any]]:
+        return prefetch(self._chunks(), self.depth)
+
+    def _chunks(self) -> Iterator[Tuple[int, Any]]:
+        index = self.start
+
+        while True:
+            chunk = self.load(index)
+
+            if self.wrap and chunk.total_rows == 0:
+                if index == 0:
+                    return
+
+                index = 0
+                continue
+
+            yield index, chunk
+            index += 1
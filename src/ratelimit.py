@@ -0,0 +1,124 @@
+from typing import Dict, Literal, Optional
+import threading, time
+
+from .enums import *
+
+
+Endpoint = Literal["api", "web"]
+
+
+class Cooldown:
+    def __init__(
+        self,
+        initial_sleep_time: float = INITIAL_SLEEP_TIME,
+        max_sleep_time: float = MAX_SLEEP_TIME,
+    ):
+        self.initial_sleep_time = initial_sleep_time
+        self.max_sleep_time = max_sleep_time
+        self.sleep_time = initial_sleep_time
+        self.until = 0.0
+        self._lock = threading.Lock()
+
+    def trigger(self, duration: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+
+            if now < self.until:
+                return
+
+            if duration is None:
+                duration = self.sleep_time
+                self.sleep_time = min(self.sleep_time * 2, self.max_sleep_time)
+
+            self.until = now + duration
+
+    def reset(self) -> None:
+        with self._lock:
+            if time.monotonic() >= self.until:
+                self.sleep_time = self.initial_sleep_time
+
+    def wait(self) -> None:
+        while True:
+            remaining = self.until - time.monotonic()
+
+            if remaining <= 0:
+                return
+
+            time.sleep(remaining)
+
+
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        cooldown: Cooldown,
+        rate: float = RATE_LIMIT_INITIAL_RATE,
+        min_rate: float = RATE_LIMIT_MIN_RATE,
+        max_rate: float = RATE_LIMIT_MAX_RATE,
+        increase: float = RATE_LIMIT_INCREASE,
+        decrease_factor: float = RATE_LIMIT_DECREASE_FACTOR,
+    ):
+        self.cooldown = cooldown
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+
+        self.tokens = 1.0
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            self.cooldown.wait()
+
+            with self._lock:
+                self._refill()
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait_time = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_time)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.rate + self.increase / self.rate, self.max_rate)
+
+        self.cooldown.reset()
+
+    def on_error(self) -> None:
+        with self._lock:
+            self._decrease()
+
+    def on_throttle(self, duration: Optional[float] = None) -> None:
+        with self._lock:
+            self._decrease()
+
+        self.cooldown.trigger(duration)
+
+    def _decrease(self) -> None:
+        self._refill()
+        self.rate = max(self.rate * self.decrease_factor, self.min_rate)
+        self.tokens = min(self.tokens, 1.0)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        capacity = max(self.rate, 1.0)
+
+        self.tokens = min(self.tokens + (now - self.updated_at) * self.rate, capacity)
+        self.updated_at = now
+
+
+COOLDOWN = Cooldown()
+
+LIMITERS: Dict[Endpoint, AdaptiveRateLimiter] = {
+    "api": AdaptiveRateLimiter(COOLDOWN),
+    "web": AdaptiveRateLimiter(COOLDOWN),
+}
+
+
+def get_limiter(endpoint: Endpoint) -> AdaptiveRateLimiter:
+    return LIMITERS[endpoint]
@@ -0,0 +1,104 @@
+from typing import Dict
+from datetime import date, timedelta
+
+from google.cloud import bigquery
+
+from .bigquery import (
+    execute,
+    query_backfill_point_dates,
+    query_expire_rows,
+    query_expire_undated_points,
+    query_partition_table,
+    query_point_dates,
+    query_remove_orphan_candidates,
+)
+from .enums import (
+    PROJECT_ID,
+    VINTED_DATASET_ID,
+    CANDIDATE_TABLE_ID,
+    ITEM_TABLE_ID,
+    PINECONE_TABLE_ID,
+    SOLD_TABLE_ID,
+)
+
+
+RETENTION_COLUMNS = {
+    PINECONE_TABLE_ID: "created_at",
+    SOLD_TABLE_ID: "updated_at",
+    ITEM_TABLE_ID: "created_at",
+}
+EXPIRING_TABLES = {**RETENTION_COLUMNS, CANDIDATE_TABLE_ID: "created_at"}
+UNDATED_TABLES = [PINECONE_TABLE_ID]
+
+
+def get_cutoff(lookback_days: int) -> date:
+    return date.today() - timedelta(days=lookback_days)
+
+
+def partition_tables(client: bigquery.Client) -> None:
+    for table_id, column in RETENTION_COLUMNS.items():
+        if ensure_partitioned(client, table_id, column):
+            print(f"Partitioned {table_id} by DATE({column})")
+
+
+def ensure_partitioned(client: bigquery.Client, table_id: str, column: str) -> bool:
+    table = client.get_table(f"{PROJECT_ID}.{VINTED_DATASET_ID}.{table_id}")
+
+    if table.time_partitioning is not None:
+        return False
+
+    if table_id == PINECONE_TABLE_ID:
+        source = query_point_dates()
+    else:
+        source = f"SELECT * FROM `{PROJECT_ID}.{VINTED_DATASET_ID}.{table_id}`"
+
+    execute(client, query_partition_table(table_id, column, source)).result()
+
+    return True
+
+
+def has_point_dates(client: bigquery.Client) -> bool:
+    table = client.get_table(f"{PROJECT_ID}.{VINTED_DATASET_ID}.{PINECONE_TABLE_ID}")
+
+    return any(field.name == "created_at" for field in table.schema)
+
+
+def backfill(client: bigquery.Client) -> int:
+    job = execute(client, query_backfill_point_dates())
+    job.result()
+
+    return job.num_dml_affected_rows or 0
+
+
+def expire(
+    client: bigquery.Client, cutoff: date, dated: bool = True
+) -> Dict[str, int]:
+    deleted = {}
+
+    for table_id, column in EXPIRING_TABLES.items():
+        if table_id == PINECONE_TABLE_ID and not dated:
+            query = query_expire_undated_points(cutoff)
+        else:
+            query = query_expire_rows(
+                table_id, column, cutoff, undated=table_id in UNDATED_TABLES
+            )
+
+        try:
+            job = execute(client, query)
+            job.result()
+            deleted[table_id] = job.num_dml_affected_rows or 0
+        except Exception as e:
+            print(e)
+            deleted[table_id] = 0
+
+    return deleted
+
+
+def remove_orphan_candidates(client: bigquery.Client) -> int:
+    try:
+        job = execute(client, query_remove_orphan_candidates())
+        job.result()
+        return job.num_dml_affected_rows or 0
+    except Exception as e:
+        print(e)
+        return 0
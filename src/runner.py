@@ -1,5 +1,8 @@
-from typing import List, Tuple, Union, Optional
+from typing import Dict, List, Tuple, Union, Optional, Iterable, Iterator
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+import multiprocessing, threading
 
 import tqdm
 from google.cloud import bigquery
@@ -8,10 +11,22 @@ import src
 from src.models import RunnerMode, JobConfig
 
 
+DataLoader = Union[
+    bigquery.table.RowIterator,
+    src.models.PineconeDataLoader,
+    src.models.ArrowDataLoader,
+    src.models.StreamDataLoader,
+]
+
 DOMAIN = "fr"
 DRIVER_RESTART_EVERY = 500
 UPDATE_EVERY = 100
 SUCCESS_RATE_THRESHOLD = 0.8
+NUM_WORKERS = 1
+NUM_SINKS = 3
+IN_FLIGHT_PER_WORKER = 2
+WARDROBE_WINDOW = 1000
+MIN_WARDROBE_GROUP = 2
 
 
 class Runner:
@@ -19,32 +34,62 @@ class Runner:
         self,
         mode: RunnerMode,
         config: JobConfig,
+        num_workers: int = NUM_WORKERS,
+        driver_pool_size: int = src.driver.DRIVER_POOL_SIZE,
+        batch_by_seller: bool = False,
+        cache: Optional[src.cache.StatusCache] = None,
+        parse_processes: int = 0,
+        outbox: Optional[src.outbox.Outbox] = None,
     ):
         self.mode = mode
         self.config = config
+        self.num_workers = max(1, num_workers)
+        self.driver_pool_size = driver_pool_size
+        self.batch_by_seller = batch_by_seller
+        self.cache = cache
+        self.outbox = outbox
 
         self.driver_restart_every = DRIVER_RESTART_EVERY
         self.update_every = UPDATE_EVERY
 
+        self._mode_lock = threading.Lock()
+        self._parser = None
+
+        if parse_processes > 0:
+            self._parser = ProcessPoolExecutor(
+                max_workers=parse_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        self._sink_executor = ThreadPoolExecutor(max_workers=NUM_SINKS)
+        self.writer = src.writer.WriteBehind(self._update)
+        self.sold_writer = src.writer.SoldWriter(config.bq_client)
+        self.point_map = src.cache.PointIdMap(config.bq_client)
+        self.sink_failures = Counter()
+
     def run(
         self,
-        data_loader: Union[bigquery.table.RowIterator, src.models.PineconeDataLoader],
+        data_loader: DataLoader,
         loop: Optional[tqdm.tqdm] = None,
     ) -> None:
         item_ids, vinted_ids, point_ids = [], [], []
         n, n_success, n_available, n_unavailable, n_updated = 0, 0, 0, 0, 0
 
+        self.replay()
+
+        if isinstance(data_loader, src.models.PineconeDataLoader):
+            self.point_map.preload(
+                entry.id for entry in data_loader.entries if not entry.point_id
+            )
+
         if loop is None:
             iterator = tqdm.tqdm(iterable=data_loader, total=data_loader.total_rows)
         else:
             iterator = data_loader
 
-        for entry in iterator:
+        for entry, status in self._check_entries(iterator):
             n += 1
 
-            if not isinstance(entry, src.models.PineconeEntry):
-                entry = src.models.PineconeEntry.from_dict(dict(entry))
-
             (
                 vinted_ids,
                 item_ids,
@@ -54,6 +99,7 @@ class Runner:
                 n_success,
             ) = self._process_entry(
                 entry,
+                status,
                 vinted_ids,
                 item_ids,
                 point_ids,
@@ -63,31 +109,215 @@ class Runner:
             )
 
             if self._check_update(n, data_loader, item_ids, vinted_ids):
-                success = self._update(item_ids, vinted_ids, point_ids)
+                self._submit(src.models.UpdateBatch(item_ids, vinted_ids, point_ids))
+                item_ids, vinted_ids, point_ids = [], [], []
 
-                if success:
-                    n_updated += len(item_ids)
+            n_updated += self._collect_updates()
 
-                item_ids, vinted_ids, point_ids = [], [], []
+            info = self._describe(n, n_success, n_available, n_unavailable, n_updated)
 
-            info = (
-                f"Processed: {n} | "
-                f"Success: {n_success} | "
-                f"Success rate: {n_success / n:.2f} | "
-                f"Available: {n_available} | "
-                f"Unavailable: {n_unavailable} | "
-                f"Updated: {n_updated}"
-            )
+            if loop is not None:
+                loop.set_description(info)
+            else:
+                iterator.set_description(info)
+
+        if item_ids:
+            self._submit(src.models.UpdateBatch(item_ids, vinted_ids, point_ids))
+
+        self.writer.flush()
+
+        if self.outbox:
+            self.outbox.compact(self.sold_writer.committed_at)
+
+        n_updated += self._collect_updates()
+
+        if n > 0:
+            info = self._describe(n, n_success, n_available, n_unavailable, n_updated)
 
             if loop is not None:
                 loop.set_description(info)
             else:
                 iterator.set_description(info)
 
+    def _describe(
+        self,
+        n: int,
+        n_success: int,
+        n_available: int,
+        n_unavailable: int,
+        n_updated: int,
+    ) -> str:
+        info = (
+            f"Processed: {n} | "
+            f"Success: {n_success} | "
+            f"Success rate: {n_success / n:.2f} | "
+            f"Available: {n_available} | "
+            f"Unavailable: {n_unavailable} | "
+            f"Updated: {n_updated}"
+        )
+
+        if self.sink_failures:
+            failures = ", ".join(
+                f"{sink}={count}" for sink, count in self.sink_failures.items()
+            )
+            info += f" | Failed: {failures}"
+
+        if self.cache:
+            info += f" | Cache: {self.cache.hits}/{self.cache.misses}"
+
+        return info
+
+    def _collect_updates(self) -> int:
+        n_updated = 0
+
+        for result in self.writer.results():
+            for sink, success in result.sinks.items():
+                if not success:
+                    self.sink_failures[sink] += 1
+
+            if result.success:
+                n_updated += len(result.batch)
+
+        return n_updated
+
+    def _check_entries(
+        self, entries: Iterable
+    ) -> Iterator[Tuple[src.models.PineconeEntry, src.models.ItemStatus]]:
+        entries = (self._to_entry(entry) for entry in entries)
+        tasks = ((entry, self._get_cached(entry)) for entry in entries)
+
+        if self.batch_by_seller:
+            tasks = self._resolve_wardrobes(tasks)
+
+        if self.num_workers == 1:
+            for entry, status in tasks:
+                if status is None:
+                    status = self._check_entry(entry)
+
+                yield entry, status
+
+            return
+
+        max_in_flight = self.num_workers * IN_FLIGHT_PER_WORKER
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            for entry, status in tasks:
+                if status is None:
+                    status = executor.submit(self._check_entry, entry)
+
+                pending.append((entry, status))
+
+                if len(pending) >= max_in_flight:
+                    yield self._pop_result(pending)
+
+            while pending:
+                yield self._pop_result(pending)
+
+    def _pop_result(
+        self, pending: deque
+    ) -> Tuple[src.models.PineconeEntry, src.models.ItemStatus]:
+        entry, status = pending.popleft()
+
+        if not isinstance(status, src.models.ItemStatus):
+            status = status.result()
+
+        return entry, status
+
+    def _resolve_wardrobes(
+        self,
+        tasks: Iterable[
+            Tuple[src.models.PineconeEntry, Optional[src.models.ItemStatus]]
+        ],
+    ) -> Iterator[
+        Tuple[src.models.PineconeEntry, Optional[src.models.ItemStatus]]
+    ]:
+        window = []
+
+        for task in tasks:
+            window.append(task)
+
+            if len(window) >= WARDROBE_WINDOW:
+                yield from self._resolve_window(window)
+                window = []
+
+        if window:
+            yield from self._resolve_window(window)
+
+    def _resolve_window(
+        self,
+        window: List[
+            Tuple[src.models.PineconeEntry, Optional[src.models.ItemStatus]]
+        ],
+    ) -> Iterator[
+        Tuple[src.models.PineconeEntry, Optional[src.models.ItemStatus]]
+    ]:
+        sellers = defaultdict(list)
+
+        for entry, status in window:
+            if status is None and entry.user_id:
+                sellers[entry.user_id].append(entry.vinted_id)
+
+        groups = [
+            (user_id, vinted_ids)
+            for user_id, vinted_ids in sellers.items()
+            if len(vinted_ids) >= MIN_WARDROBE_GROUP
+        ]
+
+        statuses = {}
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            for result in executor.map(lambda args: self._get_wardrobe(*args), groups):
+                statuses.update(result)
+
+        for entry, status in window:
+            if status is None:
+                status = statuses.get(str(entry.vinted_id))
+
+                if status is not None and self.cache:
+                    self.cache.put(entry.vinted_id, status)
+
+            yield entry, status
+
+    def _get_wardrobe(
+        self, user_id: str, vinted_ids: List[str]
+    ) -> Dict[str, src.models.ItemStatus]:
+        try:
+            return src.status.get_statuses_wardrobe(
+                self.config.vinted_client, int(user_id), vinted_ids
+            )
+        except Exception:
+            return {}
+
+    def _to_entry(self, entry) -> src.models.PineconeEntry:
+        if not isinstance(entry, src.models.PineconeEntry):
+            entry = src.models.PineconeEntry.from_dict(dict(entry))
+
+        return entry
+
+    def _get_cached(
+        self, entry: src.models.PineconeEntry
+    ) -> Optional[src.models.ItemStatus]:
+        if self.cache is None:
+            return None
+
+        return self.cache.get(entry.vinted_id)
+
+    def _check_entry(self, entry: src.models.PineconeEntry) -> src.models.ItemStatus:
+        try:
+            status = self._get_status(entry)
+        except Exception:
+            status = src.models.ItemStatus.UNKNOWN
+
+        if self.cache:
+            self.cache.put(entry.vinted_id, status)
+
+        return status
+
     def _check_update(
         self,
         n: int,
-        data_loader: Union[bigquery.table.RowIterator, src.models.PineconeDataLoader],
+        data_loader: DataLoader,
         item_ids: List[str],
         vinted_ids: List[str],
     ) -> bool:
@@ -96,53 +326,132 @@ class Runner:
 
         return first_condition and second_condition
 
-    def _update(
-        self, item_ids: List[str], vinted_ids: List[str], point_ids: List[str]
-    ) -> bool:
-        current_time = datetime.now().isoformat()
+    def replay(self) -> int:
+        if self.outbox is None:
+            return 0
 
-        if len(point_ids) == 0:
-            pinecone_points_query = src.bigquery.query_pinecone_points(item_ids)
+        n_replayed = 0
 
-            loader = src.bigquery.run_query(
-                self.config.bq_client, pinecone_points_query, to_list=False
-            )
+        for mutation_ids, batch, sinks in self.outbox.pending():
+            result = self._apply(batch, sinks)
+            self.outbox.mark(mutation_ids, result)
+            n_replayed += len(batch) if result.success else 0
+
+        if n_replayed > 0:
+            print(f"Replayed {n_replayed} pending updates from the outbox.")
 
-            if loader.total_rows == 0:
-                return False
+        return n_replayed
 
-            point_ids = [row.point_id for row in loader]
+    def _submit(self, batch: src.models.UpdateBatch) -> None:
+        sinks = ["pinecone", "bigquery"]
+        mutation_id = None
 
         if self.config.supabase_client:
-            success = src.supabase.set_items_unavailable(
-                self.config.supabase_client, item_ids
+            sinks.insert(0, "supabase")
+
+        if self.outbox:
+            mutation_id = self.outbox.record(batch, sinks)
+
+        self.writer.submit(batch, sinks, mutation_id)
+
+    def _update(
+        self,
+        batch: src.models.UpdateBatch,
+        sinks: List[str],
+        mutation_id: Optional[int] = None,
+    ) -> src.models.UpdateResult:
+        result = self._apply(batch, sinks)
+
+        if mutation_id is not None:
+            self.outbox.mark([mutation_id], result)
+
+        return result
+
+    def _apply(
+        self, batch: src.models.UpdateBatch, sinks: List[str]
+    ) -> src.models.UpdateResult:
+        result = src.models.UpdateResult(batch)
+        supabase_future = None
+
+        if "supabase" in sinks and self.config.supabase_client:
+            supabase_future = self._sink_executor.submit(
+                src.supabase.set_items_unavailable,
+                self.config.supabase_client,
+                batch.item_ids,
             )
 
-        success_rate, failed = src.pinecone.delete_points_from_ids(
+        index_future = None
+
+        if "pinecone" in sinks or "bigquery" in sinks:
+            index_future = self._sink_executor.submit(
+                self._update_index,
+                batch,
+                "pinecone" in sinks,
+                "bigquery" in sinks,
+            )
+
+        if supabase_future:
+            result.supabase = supabase_future.result()
+
+        if index_future:
+            pinecone, bigquery = index_future.result()
+
+            if "pinecone" in sinks:
+                result.pinecone = pinecone
+
+            if "bigquery" in sinks:
+                result.bigquery = bigquery
+
+        return result
+
+    def _update_index(
+        self,
+        batch: src.models.UpdateBatch,
+        delete_points: bool = True,
+        append_sold: bool = True,
+    ) -> Tuple[bool, bool]:
+        current_time = datetime.now().isoformat()
+
+        if not delete_points:
+            return True, append_sold and self._append_sold(batch, current_time)
+
+        point_ids = [point_id for point_id in batch.point_ids if point_id]
+        missing = [
+            item_id
+            for item_id, point_id in zip(batch.item_ids, batch.point_ids)
+            if not point_id
+        ]
+
+        if missing:
+            point_ids += self.point_map.lookup(missing)
+
+        if len(point_ids) == 0:
+            return False, False
+
+        report = src.pinecone.delete_points_from_ids(
             index=self.config.pinecone_index, ids=point_ids, verbose=False
         )
 
-        if success_rate > SUCCESS_RATE_THRESHOLD:
-            try:
-                rows = [
-                    {"vinted_id": vinted_id, "updated_at": current_time}
-                    for vinted_id in vinted_ids
-                ]
+        if report.success_rate <= SUCCESS_RATE_THRESHOLD:
+            return False, False
 
-                errors = self.config.bq_client.insert_rows_json(
-                    table=f"{src.enums.VINTED_DATASET_ID}.{src.enums.SOLD_TABLE_ID}",
-                    json_rows=rows,
-                )
-                return not errors
+        if not append_sold:
+            return True, False
+
+        return True, self._append_sold(batch, current_time)
 
-            except:
-                return False
+    def _append_sold(self, batch: src.models.UpdateBatch, current_time: str) -> bool:
+        rows = [
+            {"vinted_id": vinted_id, "updated_at": current_time}
+            for vinted_id in batch.vinted_ids
+        ]
 
-        return False
+        return self.sold_writer.append(rows)
 
     def _process_entry(
         self,
         entry: src.models.PineconeEntry,
+        status: src.models.ItemStatus,
         vinted_ids: List[str],
         item_ids: List[str],
         point_ids: List[str],
@@ -157,11 +466,6 @@ class Runner:
         int,
         int,
     ]:
-        try:
-            status = self._get_status(entry)
-        except Exception as e:
-            status = src.models.ItemStatus.UNKNOWN
-
         is_available = src.status.is_available(status)
         success = status != src.models.ItemStatus.UNKNOWN
 
@@ -184,8 +488,15 @@ class Runner:
             n_success,
         )
 
-    def _get_status(self, entry: src.models.PineconeEntry) -> src.models.ItemStatus:
-        if self.mode == "api":
+    def _get_status(
+        self,
+        entry: src.models.PineconeEntry,
+        mode: Optional[RunnerMode] = None,
+        fallback: bool = True,
+    ) -> src.models.ItemStatus:
+        mode = mode or self.mode
+
+        if mode == "api":
             status = src.status.get_status_api(
                 self.config.vinted_client, int(entry.vinted_id)
             )
@@ -194,15 +505,17 @@ class Runner:
                 src.models.ItemStatus.UNKNOWN,
                 src.models.ItemStatus.NOT_FOUND,
             ]:
-                status = src.status.get_status_web(entry.url)
+                status = src.status.get_status_web(entry.url, parser=self._parser)
 
-            if status == src.models.ItemStatus.UNKNOWN:
-                self._switch_mode("driver")
+            if status == src.models.ItemStatus.UNKNOWN and fallback:
+                self._switch_mode("driver", current_mode=mode)
 
-                return self._get_status(entry)
+                return self._get_status(entry, "driver", fallback=False)
 
         else:
-            status = src.status.get_status_web(entry.url, self.config.driver)
+            with self._get_driver_pool().lease() as driver:
+                status = src.status.get_status_web(entry.url, driver, self._parser)
+
             switch_mode = status == src.models.ItemStatus.UNKNOWN
 
             if status in [
@@ -214,25 +527,50 @@ class Runner:
                     item_id=entry.vinted_id,
                 )
 
-            if switch_mode:
-                self._switch_mode("api")
+            if switch_mode and fallback:
+                self._switch_mode("api", current_mode=mode)
 
-                return self._get_status(entry)
+                return self._get_status(entry, "api", fallback=False)
 
         return status
 
-    def _switch_mode(self, new_mode: RunnerMode) -> None:
-        self.mode = new_mode
+    def _switch_mode(
+        self, new_mode: RunnerMode, current_mode: Optional[RunnerMode] = None
+    ) -> None:
+        with self._mode_lock:
+            if current_mode is not None and self.mode != current_mode:
+                return
 
-        if new_mode == "api":
-            self._quit_driver(restart=False)
-        else:
-            self._quit_driver(restart=True)
+            self.mode = new_mode
+
+        if new_mode == "driver":
+            self._get_driver_pool()
+
+    def _get_driver_pool(self) -> src.driver.DriverPool:
+        with self._mode_lock:
+            if self.config.driver_pool is None:
+                self.config.driver_pool = src.driver.DriverPool(
+                    size=self.driver_pool_size,
+                    max_pages=self.driver_restart_every,
+                )
+
+            return self.config.driver_pool
+
+    def close(self) -> None:
+        self.writer.close()
+        self.sold_writer.close()
+        self._sink_executor.shutdown()
+
+        if self._parser:
+            self._parser.shutdown()
+
+        if self.cache:
+            self.cache.close()
 
-    def _quit_driver(self, restart: bool = False):
-        if self.config.driver:
-            self.config.driver.quit()
-            self.config.driver = None
+        if self.outbox:
+            self.outbox.compact(self.sold_writer.committed_at)
+            self.outbox.close()
 
-        if restart:
-            self.config.driver = src.driver.init_webdriver()
+        if self.config.driver_pool:
+            self.config.driver_pool.close()
+            self.config.driver_pool = None
@@ -0,0 +1,128 @@
+from typing import Dict, Iterable, Optional, Tuple, Union
+from datetime import datetime, timezone
+import bisect, heapq, itertools, time
+
+from .enums import AGE_DAYS_BUCKETS, NUM_LIKES_BUCKETS
+from .models import PineconeEntry, PineconeDataLoader
+from .cache import StatusCache
+
+
+PRIOR_STRENGTH = 50
+RECHECK_HORIZON_HOURS = 24
+
+
+class SellProbabilityModel:
+    def __init__(self, prior_strength: float = PRIOR_STRENGTH):
+        self.prior_strength = prior_strength
+        self.global_rate = 0.0
+        self.bucket_counts: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self.brand_counts: Dict[Tuple[int, int, str], Tuple[int, int]] = {}
+
+    def fit(self, rows: Iterable[Dict]) -> "SellProbabilityModel":
+        n_total, n_sold_total = 0, 0
+
+        for row in rows:
+            bucket = (row["age_bucket"], row["likes_bucket"])
+            n, n_sold = row["n"], row["n_sold"]
+
+            self.bucket_counts[bucket] = _add(self.bucket_counts.get(bucket), n, n_sold)
+            self.brand_counts[(*bucket, row["brand"])] = (n, n_sold)
+
+            n_total += n
+            n_sold_total += n_sold
+
+        self.global_rate = n_sold_total / n_total if n_total else 0.0
+
+        return self
+
+    def predict(self, age_days: float, num_likes: int, brand: Optional[str]) -> float:
+        bucket = (
+            bisect.bisect_right(AGE_DAYS_BUCKETS, age_days),
+            bisect.bisect_right(NUM_LIKES_BUCKETS, num_likes or 0),
+        )
+
+        rate = self._smooth(self.bucket_counts.get(bucket), self.global_rate)
+
+        return self._smooth(self.brand_counts.get((*bucket, brand)), rate)
+
+    def _smooth(self, counts: Optional[Tuple[int, int]], prior: float) -> float:
+        if counts is None:
+            return prior
+
+        n, n_sold = counts
+
+        return (n_sold + self.prior_strength * prior) / (n + self.prior_strength)
+
+
+class PriorityScheduler:
+    def __init__(
+        self,
+        model: SellProbabilityModel,
+        cache: Optional[StatusCache] = None,
+        horizon_hours: float = RECHECK_HORIZON_HOURS,
+    ):
+        self.model = model
+        self.cache = cache
+        self.horizon_hours = horizon_hours
+
+    def schedule(self, rows: Iterable, budget: int) -> PineconeDataLoader:
+        heap, counter = [], itertools.count()
+        now = time.time()
+
+        for row in rows:
+            row = dict(row)
+            item = (self.score(row, now), -next(counter), row)
+
+            if len(heap) < budget:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heappushpop(heap, item)
+
+        loader = PineconeDataLoader()
+
+        for _, _, row in sorted(heap, key=lambda item: (-item[0], -item[1])):
+            loader.add(PineconeEntry.from_dict(row))
+
+        return loader
+
+    def score(self, row: Dict, now: float) -> float:
+        age_hours = _age_hours(row.get("created_at"), now)
+        since_check_hours = self.horizon_hours
+
+        if self.cache:
+            observed_at = self.cache.observed_at(row["vinted_id"])
+
+            if observed_at is not None:
+                since_check_hours = max(now - observed_at, 0.0) / 3600
+
+        probability = self.model.predict(
+            age_hours / 24, row.get("num_likes"), row.get("brand")
+        )
+
+        return probability * min(since_check_hours / self.horizon_hours, 1.0)
+
+
+def _add(counts: Optional[Tuple[int, int]], n: int, n_sold: int) -> Tuple[int, int]:
+    if counts is None:
+        return n, n_sold
+
+    return counts[0] + n, counts[1] + n_sold
+
+
+def _age_hours(created_at: Union[datetime, str, float, None], now: float) -> float:
+    if isinstance(created_at, (int, float)):
+        return max(now - created_at, 0.0) / 3600
+
+    if isinstance(created_at, str):
+        try:
+            created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        except ValueError:
+            return 0.0
+
+    if not isinstance(created_at, datetime):
+        return 0.0
+
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+
+    return max(now - created_at.timestamp(), 0.0) / 3600
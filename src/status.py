@@ -1,4 +1,5 @@
-from typing import Optional
+from typing import Dict, List, Optional
+from concurrent.futures import Executor
 
 import requests
 from selenium.webdriver.chrome.webdriver import WebDriver
@@ -7,6 +8,7 @@ from .vinted import Vinted, VintedResponse
 from .models import ItemStatus
 from .enums import *
 from .utils import retry_with_backoff, parse_web_content
+from .ratelimit import get_limiter
 
 
 def is_available(item_status: ItemStatus) -> bool | None:
@@ -16,11 +18,15 @@ def is_available(item_status: ItemStatus) -> bool | None:
         return False
 
 
-def get_status_web(item_url: str, driver: Optional[WebDriver] = None) -> ItemStatus:
+def get_status_web(
+    item_url: str,
+    driver: Optional[WebDriver] = None,
+    parser: Optional[Executor] = None,
+) -> ItemStatus:
     if driver:
-        return _get_status_selenium(driver, item_url)
+        return _get_status_selenium(driver, item_url, parser)
 
-    return _get_status_requests(item_url)
+    return _get_status_requests(item_url, parser)
 
 
 def get_status_api(client: Vinted, item_id: int) -> ItemStatus:
@@ -29,7 +35,7 @@ def get_status_api(client: Vinted, item_id: int) -> ItemStatus:
 
         return response, response.status_code
 
-    result = retry_with_backoff(func)
+    result = retry_with_backoff(func, limiter=get_limiter("api"))
 
     if result is None:
         return ItemStatus.UNKNOWN
@@ -37,14 +43,66 @@ def get_status_api(client: Vinted, item_id: int) -> ItemStatus:
     return _get_status_api(result)
 
 
-def _get_status_requests(item_url: str) -> ItemStatus:
+def get_statuses_wardrobe(
+    client: Vinted,
+    user_id: int,
+    vinted_ids: List[str],
+    max_pages: int = WARDROBE_MAX_PAGES,
+) -> Dict[str, ItemStatus]:
+    limiter = get_limiter("api")
+    remaining = {str(vinted_id) for vinted_id in vinted_ids}
+    statuses = {}
+    max_pages = min(max_pages, max(len(remaining) - 1, 1))
+
+    for page in range(1, max_pages + 1):
+
+        def func():
+            response = client.user_items(user_id, page=page)
+
+            return response, response.status_code
+
+        response = retry_with_backoff(func, limiter=limiter)
+
+        if response is None or response.status_code != 200 or not response.data:
+            return statuses
+
+        items = response.data.get("items", [])
+
+        for item in items:
+            vinted_id = str(item.get("id"))
+
+            if vinted_id not in remaining:
+                continue
+
+            status = _get_status_item_info(item)
+
+            if status != ItemStatus.UNKNOWN:
+                statuses[vinted_id] = status
+                remaining.discard(vinted_id)
+
+        pagination = response.data.get("pagination") or {}
+        total_pages = pagination.get("total_pages")
+
+        if not items or len(remaining) < 2 or len(statuses) < page:
+            return statuses
+
+        if total_pages is not None and page >= total_pages:
+            return statuses
+
+    return statuses
+
+
+def _get_status_requests(
+    item_url: str, parser: Optional[Executor] = None
+) -> ItemStatus:
     def func():
         response = requests.get(item_url, headers=REQUESTS_HEADERS)
         status_code = response.status_code
 
         return response, status_code
 
-    result = retry_with_backoff(func)
+    limiter = get_limiter("web")
+    result = retry_with_backoff(func, limiter=limiter)
 
     if result is None:
         return ItemStatus.UNKNOWN
@@ -56,19 +114,31 @@ def _get_status_requests(item_url: str) -> ItemStatus:
     if response.url != item_url:
         return ItemStatus.NOT_FOUND
 
-    return parse_web_content(response.content)
+    return parse_web_content(response.content, limiter, parser)
 
 
-def _get_status_selenium(driver: WebDriver, item_url: str) -> ItemStatus:
+def _get_status_selenium(
+    driver: WebDriver, item_url: str, parser: Optional[Executor] = None
+) -> ItemStatus:
+    limiter = get_limiter("web")
+    limiter.acquire()
+
     try:
         driver.get(item_url)
 
         if driver.current_url != item_url:
+            limiter.on_success()
             return ItemStatus.NOT_FOUND
 
-        return parse_web_content(driver.page_source)
+        status = parse_web_content(driver.page_source, limiter, parser)
+
+        if status != ItemStatus.UNKNOWN:
+            limiter.on_success()
+
+        return status
 
     except Exception:
+        limiter.on_error()
         return ItemStatus.UNKNOWN
 
 
@@ -81,19 +151,23 @@ def _get_status_api(response: VintedResponse) -> ItemStatus:
         if not item_info:
             return ItemStatus.SOLD
 
-        is_available = item_info.get("can_be_sold")
-        if is_available == False:
-            return ItemStatus.SOLD
-        elif is_available == True:
-            return ItemStatus.AVAILABLE
-
-        is_closed = item_info.get("is_closed")
-        if is_closed == True:
-            return ItemStatus.SOLD
-        elif is_closed == False:
-            return ItemStatus.AVAILABLE
-
-        return ItemStatus.UNKNOWN
+        return _get_status_item_info(item_info)
 
     else:
         return ItemStatus.UNKNOWN
+
+
+def _get_status_item_info(item_info: Dict) -> ItemStatus:
+    is_available = item_info.get("can_be_sold")
+    if is_available == False:
+        return ItemStatus.SOLD
+    elif is_available == True:
+        return ItemStatus.AVAILABLE
+
+    is_closed = item_info.get("is_closed")
+    if is_closed == True:
+        return ItemStatus.SOLD
+    elif is_closed == False:
+        return ItemStatus.AVAILABLE
+
+    return ItemStatus.UNKNOWN
@@ -1,10 +1,13 @@
-from typing import Callable, Any
+from typing import Callable, Any, Optional
+from concurrent.futures import Executor
 import json
 import time, requests
 from bs4 import BeautifulSoup
 
 from .enums import *
-from .models import ItemStatus
+from .models import ItemStatus, PageClass
+from .ratelimit import AdaptiveRateLimiter
+from .classifier import RawContent, classify_page
 
 
 def save_json(data: Any, filepath: str) -> bool:
@@ -17,11 +20,19 @@ def save_json(data: Any, filepath: str) -> bool:
         return False
 
 
-def retry_with_backoff(func: Callable, *args, **kwargs) -> Any:
+def retry_with_backoff(
+    func: Callable,
+    *args,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+    **kwargs,
+) -> Any:
     sleep_time = INITIAL_SLEEP_TIME
     retries = 0
 
     while retries < MAX_RETRIES:
+        if limiter:
+            limiter.acquire()
+
         try:
             result = func(*args, **kwargs)
 
@@ -29,19 +40,23 @@ def retry_with_backoff(func: Callable, *args, **kwargs) -> Any:
                 status_code = result[1]
 
                 if status_code in INVALID_STATUS_CODES:
-                    time.sleep(sleep_time)
-                    sleep_time = min(sleep_time * 2, MAX_SLEEP_TIME)
+                    sleep_time = _backoff(sleep_time, limiter)
                     retries += 1
                     continue
 
+                if limiter:
+                    limiter.on_success()
+
                 return result[0]
 
+            if limiter:
+                limiter.on_success()
+
             return result
 
         except requests.exceptions.HTTPError as e:
             if e.response.status_code in INVALID_STATUS_CODES:
-                time.sleep(sleep_time)
-                sleep_time = min(sleep_time * 2, MAX_SLEEP_TIME)
+                sleep_time = _backoff(sleep_time, limiter)
                 retries += 1
                 continue
 
@@ -49,8 +64,12 @@ def retry_with_backoff(func: Callable, *args, **kwargs) -> Any:
 
         except:
             if retries < MAX_RETRIES - 1:
-                time.sleep(sleep_time)
-                sleep_time = min(sleep_time * 2, MAX_SLEEP_TIME)
+                if limiter:
+                    limiter.on_error()
+                else:
+                    time.sleep(sleep_time)
+                    sleep_time = min(sleep_time * 2, MAX_SLEEP_TIME)
+
                 retries += 1
             else:
                 return None
@@ -58,27 +77,83 @@ def retry_with_backoff(func: Callable, *args, **kwargs) -> Any:
     return None
 
 
-def parse_web_content(raw_content: str) -> ItemStatus:
+def _backoff(sleep_time: float, limiter: Optional[AdaptiveRateLimiter]) -> float:
+    if limiter:
+        limiter.on_throttle()
+        return sleep_time
+
+    time.sleep(sleep_time)
+
+    return min(sleep_time * 2, MAX_SLEEP_TIME)
+
+
+def parse_web_content(
+    raw_content: RawContent,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+    parser: Optional[Executor] = None,
+) -> ItemStatus:
+    page_class = classify_web_content(raw_content, parser)
+
+    if page_class == PageClass.RATE_LIMITED:
+        if limiter:
+            limiter.on_throttle()
+
+        return ItemStatus.UNKNOWN
+
+    if page_class == PageClass.WAIT:
+        if limiter:
+            limiter.on_throttle(MAX_SLEEP_TIME)
+        else:
+            time.sleep(MAX_SLEEP_TIME)
+
+        return ItemStatus.UNKNOWN
+
+    if page_class == PageClass.SOLD:
+        return ItemStatus.SOLD
+
+    if page_class == PageClass.NOT_FOUND:
+        return ItemStatus.NOT_FOUND
+
+    if page_class == PageClass.AVAILABLE:
+        return ItemStatus.AVAILABLE
+
+    return ItemStatus.UNKNOWN
+
+
+def classify_web_content(
+    raw_content: RawContent, parser: Optional[Executor] = None
+) -> Optional[PageClass]:
+    page_class = classify_page(raw_content)
+
+    if page_class is None:
+        if parser:
+            page_class = parser.submit(classify_soup, raw_content).result()
+        else:
+            page_class = classify_soup(raw_content)
+
+    return page_class
+
+
+def classify_soup(raw_content: RawContent) -> Optional[PageClass]:
     try:
         soup = BeautifulSoup(raw_content, BS4_PARSER)
 
         if _extract_rate_limit_message(soup):
-            return ItemStatus.UNKNOWN
+            return PageClass.RATE_LIMITED
 
         if _extract_wait_component(soup):
-            time.sleep(MAX_SLEEP_TIME)
-            return ItemStatus.UNKNOWN
+            return PageClass.WAIT
 
         if _extract_sold_component(soup):
-            return ItemStatus.SOLD
+            return PageClass.SOLD
 
         if _extract_not_found_component(soup):
-            return ItemStatus.NOT_FOUND
+            return PageClass.NOT_FOUND
 
-        return ItemStatus.AVAILABLE
+        return PageClass.AVAILABLE
 
     except:
-        return ItemStatus.UNKNOWN
+        return None
 
 
 def _extract_not_found_component(soup: BeautifulSoup) -> bool:
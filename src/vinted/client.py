@@ -2,7 +2,7 @@ from typing import Literal
 import random, requests
 
 from .endpoints import Endpoints
-from .enums import Domain, REQUESTS_HEADERS, USER_AGENTS
+from .enums import Domain, REQUESTS_HEADERS, USER_AGENTS, USER_ITEMS_PER_PAGE
 from .models import VintedResponse
 
 
@@ -52,3 +52,16 @@ class Vinted:
         except Exception as e:
             print(e)
             return VintedResponse(status_code=500)
+
+    def user_items(
+        self, user_id: int, page: int = 1, per_page: int = USER_ITEMS_PER_PAGE
+    ) -> VintedResponse:
+        try:
+            return self._get(
+                Endpoints.USER_ITEMS,
+                user_id,
+                params={"page": page, "per_page": per_page},
+            )
+        except Exception as e:
+            print(e)
+            return VintedResponse(status_code=500)
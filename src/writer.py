@@ -0,0 +1,238 @@
+from typing import Any, Callable, Dict, List
+import glob, json, os, queue, threading, time, uuid
+
+from google.api_core import exceptions
+from google.cloud import bigquery
+
+from .enums import PROJECT_ID, VINTED_DATASET_ID, SOLD_TABLE_ID, STATE_DIR
+from .models import UpdateBatch, UpdateResult
+
+
+WRITE_QUEUE_SIZE = 10
+SOLD_SPILL_DIR = os.getenv("SOLD_SPILL_DIR", os.path.join(STATE_DIR, "sold"))
+SOLD_DEAD_LETTER_DIR = "dead"
+SOLD_COMMIT_ROWS = 5000
+SOLD_COMMIT_SECONDS = 5 * 60
+SOLD_MAX_ATTEMPTS = 5
+
+
+class WriteBehind:
+    def __init__(
+        self,
+        handler: Callable[..., UpdateResult],
+        max_queue: int = WRITE_QUEUE_SIZE,
+    ):
+        self.handler = handler
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def submit(self, batch: UpdateBatch, *args: Any) -> None:
+        self._queue.put((batch, args))
+
+    def results(self) -> List[UpdateResult]:
+        results = []
+
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def close(self) -> None:
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+
+            try:
+                if item is None:
+                    return
+
+                batch, args = item
+
+                try:
+                    result = self.handler(batch, *args)
+                except Exception as e:
+                    print(e)
+                    result = UpdateResult(batch)
+
+                self._results.put(result)
+
+            finally:
+                self._queue.task_done()
+
+
+class SoldWriter:
+    def __init__(
+        self,
+        client: bigquery.Client,
+        spill_dir: str = SOLD_SPILL_DIR,
+        max_rows: int = SOLD_COMMIT_ROWS,
+        max_age: float = SOLD_COMMIT_SECONDS,
+        max_attempts: int = SOLD_MAX_ATTEMPTS,
+    ):
+        self.client = client
+        self.spill_dir = spill_dir
+        self.dead_letter_dir = os.path.join(spill_dir, SOLD_DEAD_LETTER_DIR)
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.max_attempts = max_attempts
+
+        self._lock = threading.RLock()
+        self._file = None
+        self._segment = None
+        self._n_rows = 0
+        self._opened_at = 0.0
+        self.committed_at = 0.0
+
+        os.makedirs(spill_dir, exist_ok=True)
+        self._seal_orphans()
+        self.commit()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._tick, daemon=True)
+        self._thread.start()
+
+    def append(self, rows: List[Dict]) -> bool:
+        if not rows:
+            return True
+
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._open()
+
+                for row in rows:
+                    self._file.write(json.dumps(row) + "\n")
+
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._n_rows += len(rows)
+
+            except Exception as e:
+                print(e)
+                return False
+
+            if self._n_rows >= self.max_rows:
+                self.commit()
+
+        return True
+
+    def commit(self) -> bool:
+        with self._lock:
+            sealed_at = time.time()
+            self._seal()
+            success = True
+
+            for path in sorted(glob.glob(os.path.join(self.spill_dir, "*.sealed"))):
+                success = self._load(path) and success
+
+            if success and self._file is None:
+                self.committed_at = sealed_at
+
+            return success
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.commit()
+
+    def _open(self) -> None:
+        self._segment = self._new_segment()
+        self._file = open(self._path(self._segment, "ndjson"), "a")
+        self._n_rows = 0
+        self._opened_at = time.monotonic()
+
+    def _seal(self) -> None:
+        if self._file is None:
+            return
+
+        self._file.close()
+        os.replace(
+            self._path(self._segment, "ndjson"), self._path(self._segment, "sealed")
+        )
+        self._file, self._segment, self._n_rows = None, None, 0
+
+    def _seal_orphans(self) -> None:
+        for path in glob.glob(os.path.join(self.spill_dir, "*.ndjson")):
+            os.replace(path, path[: -len(".ndjson")] + ".sealed")
+
+    def _load(self, path: str) -> bool:
+        job_id = os.path.basename(path)[: -len(".sealed")]
+
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+            return True
+
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        )
+
+        try:
+            with open(path, "rb") as f:
+                job = self.client.load_table_from_file(
+                    f,
+                    f"{PROJECT_ID}.{VINTED_DATASET_ID}.{SOLD_TABLE_ID}",
+                    job_id=job_id,
+                    job_config=job_config,
+                )
+        except exceptions.Conflict:
+            job = self.client.get_job(job_id)
+        except Exception as e:
+            print(e)
+            return False
+
+        try:
+            job.result()
+        except Exception as e:
+            print(e)
+
+            if job.done() and job.error_result:
+                return self._retry(path, job_id)
+
+            return False
+
+        os.remove(path)
+        return True
+
+    def _retry(self, path: str, segment: str) -> bool:
+        base, _, attempts = segment.partition("-r")
+        attempts = int(attempts or 0) + 1
+
+        if attempts < self.max_attempts:
+            os.replace(path, self._path(f"{base}-r{attempts}", "sealed"))
+            return False
+
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+        dead_path = os.path.join(self.dead_letter_dir, f"{base}.ndjson")
+        os.replace(path, dead_path)
+        print(f"Gave up on {base} after {attempts} attempts, moved to {dead_path}")
+
+        return True
+
+    def _tick(self) -> None:
+        while not self._stop.wait(min(self.max_age, 30)):
+            with self._lock:
+                expired = (
+                    self._file is not None
+                    and time.monotonic() - self._opened_at >= self.max_age
+                )
+
+                if expired:
+                    self.commit()
+
+    def _new_segment(self) -> str:
+        return f"sold_{int(time.time())}_{uuid.uuid4().hex}"
+
+    def _path(self, segment: str, suffix: str) -> str:
+        return os.path.join(self.spill_dir, f"{segment}.{suffix}")
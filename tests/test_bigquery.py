@@ -0,0 +1,17 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import src
+
+
+def make_client(n):
+    client = MagicMock()
+    client.query.return_value.result.return_value = [SimpleNamespace(n=n)]
+
+    return client
+
+
+def test_interaction_buckets_grow_with_the_number_of_points():
+    assert src.bigquery.get_num_interaction_buckets(make_client(0), 500) == 1
+    assert src.bigquery.get_num_interaction_buckets(make_client(500), 500) == 1
+    assert src.bigquery.get_num_interaction_buckets(make_client(40000), 500) == 80
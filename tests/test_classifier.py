@@ -0,0 +1,85 @@
+import json, os
+from unittest.mock import patch
+
+import pytest
+
+import src
+from src.models import ItemStatus, PageClass
+from src.vinted import VintedResponse
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+PAGES = {
+    "sold": PageClass.SOLD,
+    "sold_nested": PageClass.SOLD,
+    "reserved": PageClass.AVAILABLE,
+    "hidden": PageClass.AVAILABLE,
+    "not_found": PageClass.NOT_FOUND,
+    "available": PageClass.AVAILABLE,
+    "rate_limited": PageClass.RATE_LIMITED,
+    "wait": PageClass.WAIT,
+}
+
+RESPONSES = {
+    "sold": ItemStatus.SOLD,
+    "reserved": ItemStatus.AVAILABLE,
+    "hidden": ItemStatus.AVAILABLE,
+    "not_found": ItemStatus.NOT_FOUND,
+    "available": ItemStatus.AVAILABLE,
+}
+
+
+def load_page(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, f"{name}.html"), "rb") as f:
+        return f.read()
+
+
+def load_response(name: str) -> VintedResponse:
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json")) as f:
+        return VintedResponse(**json.load(f))
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_scanner_matches_soup(name):
+    raw_content = load_page(name)
+    expected = PAGES[name]
+
+    assert src.utils.classify_soup(raw_content) == expected
+    assert src.classifier.classify_page(raw_content) in (None, expected)
+    assert src.classifier.classify_page(raw_content.decode()) in (None, expected)
+    assert src.utils.classify_web_content(raw_content) == expected
+
+
+@pytest.mark.parametrize("name", ["sold", "reserved", "not_found", "available"])
+def test_scanner_decides_simple_pages(name):
+    assert src.classifier.classify_page(load_page(name)) == PAGES[name]
+
+
+def test_scanner_defers_nested_markup():
+    assert src.classifier.classify_page(load_page("sold_nested")) is None
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_parse_web_content_matches_soup(name):
+    raw_content = load_page(name)
+
+    with patch.object(src.utils, "classify_page", return_value=None), patch(
+        "time.sleep"
+    ):
+        expected = src.utils.parse_web_content(raw_content)
+
+    with patch("time.sleep"):
+        assert src.utils.parse_web_content(raw_content) == expected
+
+
+@pytest.mark.parametrize("name", RESPONSES)
+def test_api_status(name):
+    assert src.status._get_status_api(load_response(name)) == RESPONSES[name]
+
+
+@pytest.mark.parametrize("name", RESPONSES)
+def test_api_matches_page(name):
+    status = src.utils.parse_web_content(load_page(name))
+
+    assert src.status._get_status_api(load_response(name)) == status
@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock
+
+import src
+from src.lease import LocalLeaseStore
+
+
+class ListLoader(list):
+    @property
+    def total_rows(self) -> int:
+        return len(self)
+
+
+def test_local_store_hands_out_each_chunk_once(tmp_path):
+    store = LocalLeaseStore(str(tmp_path / "lease.db"))
+
+    first = store.claim("job", "a", 2)
+    second = store.claim("job", "b", 2)
+
+    assert {first.chunk, second.chunk} == {0, 1}
+    assert store.claim("job", "c", 2) is None
+
+
+def test_local_store_reclaims_expired_leases(tmp_path):
+    store = LocalLeaseStore(str(tmp_path / "lease.db"), ttl=-1)
+
+    lease = store.claim("job", "a", 1)
+    stolen = store.claim("job", "b", 1)
+
+    assert stolen.chunk == lease.chunk
+    assert not store.renew(lease)
+    assert store.complete(stolen)
+
+
+def test_local_store_restarts_when_all_chunks_are_done(tmp_path):
+    store = LocalLeaseStore(str(tmp_path / "lease.db"))
+
+    lease = store.claim("job", "a", 1)
+    assert store.complete(lease)
+
+    assert store.claim("job", "a", 1).chunk == 0
+
+
+def test_claim_only_returns_live_leases_of_the_owner():
+    sql = " ".join(src.bigquery.query_claim_lease("job", "a", 4, 60).sql.split())
+
+    assert (
+        "WHERE job_id = @job_id AND owner = @owner AND NOT done "
+        "AND expires_at > CURRENT_TIMESTAMP();"
+    ) in sql
+
+
+def test_until_lost_stops_once_the_lease_is_lost(tmp_path):
+    store = LocalLeaseStore(str(tmp_path / "lease.db"))
+    lease = store.claim("job", "a", 1)
+    rows = ListLoader(range(5))
+    seen = []
+
+    for row in src.lease.until_lost(rows, lease):
+        seen.append(row)
+
+        if row == 1:
+            lease.lost = True
+
+    assert seen == [0, 1]
+
+
+def test_config_is_shared_by_tasks_of_an_execution():
+    configs = [
+        src.config.init_config(
+            bq_client=MagicMock(),
+            pinecone_index=None,
+            vinted_client=None,
+            top_brands_alpha=0.3,
+            vintage_dressing_alpha=0.3,
+            sort_by_date_alpha=0.5,
+            is_women_alpha=0.7,
+            seed="availability-all-abc12",
+        )
+        for _ in range(5)
+    ]
+
+    assert len({(c.id, c.sort_by_date, c.is_women) for c in configs}) == 1
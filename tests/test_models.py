@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from src.models import ArrowDataLoader
+
+
+class Column:
+    def __init__(self, values):
+        self.values = values
+
+    def to_pylist(self):
+        return list(self.values)
+
+
+class Batch:
+    def __init__(self, **columns):
+        self.names = list(columns)
+        self.columns = [Column(values) for values in columns.values()]
+        self.num_rows = len(self.columns[0].values)
+        self.schema = SimpleNamespace(names=self.names)
+
+    def column(self, i):
+        return self.columns[i]
+
+
+def make_batch(ids):
+    created_at = [datetime(2025, 1, int(i), tzinfo=timezone.utc) for i in ids]
+
+    return Batch(
+        id=ids,
+        point_id=[f"p{i}" for i in ids],
+        vinted_id=[f"v{i}" for i in ids],
+        url=[f"u{i}" for i in ids],
+        created_at=created_at,
+    )
+
+
+def test_cursor_is_saved_as_each_batch_is_consumed():
+    saved = []
+    loader = ArrowDataLoader(
+        batches=[make_batch(["1", "2"]), make_batch([]), make_batch(["3"])],
+        total_rows=3,
+        key_columns=["created_at", "id"],
+        on_cursor=saved.append,
+    )
+
+    assert loader.cursor is None
+
+    entries = []
+
+    for entry in loader:
+        entries.append(entry)
+
+        if entry.id == "3":
+            assert saved == [{"created_at": "2025-01-02T00:00:00+00:00", "id": "2"}]
+
+    assert [entry.id for entry in entries] == ["1", "2", "3"]
+    assert saved[-1] == {"created_at": "2025-01-03T00:00:00+00:00", "id": "3"}
+    assert saved[-1] == loader.cursor
+
+
+def test_cursor_follows_iter_rows():
+    saved = []
+    loader = ArrowDataLoader(
+        batches=[make_batch(["4", "5"])],
+        total_rows=2,
+        key_columns=["created_at", "id"],
+        on_cursor=saved.append,
+    )
+
+    rows = list(loader.iter_rows())
+
+    assert saved == [
+        {"created_at": rows[-1]["created_at"].isoformat(), "id": rows[-1]["id"]}
+    ]
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import src
+from src.models import UpdateBatch
+from src.outbox import Outbox, APPLIED
+
+
+def make_runner(outbox: Outbox) -> src.runner.Runner:
+    runner = src.runner.Runner.__new__(src.runner.Runner)
+    runner.config = MagicMock()
+    runner.outbox = outbox
+    runner.sold_writer = MagicMock()
+    runner.point_map = MagicMock()
+    runner._sink_executor = ThreadPoolExecutor(max_workers=src.runner.NUM_SINKS)
+
+    return runner
+
+
+def test_replay_supabase_only_writes_no_sold_rows(tmp_path, monkeypatch):
+    set_unavailable = MagicMock(return_value=True)
+    delete_points = MagicMock()
+    monkeypatch.setattr(src.supabase, "set_items_unavailable", set_unavailable)
+    monkeypatch.setattr(src.pinecone, "delete_points_from_ids", delete_points)
+
+    outbox = Outbox(path=str(tmp_path / "outbox.db"))
+    mutation_id = outbox.record(UpdateBatch(["1"], ["10"], ["p1"]), ["supabase"])
+
+    runner = make_runner(outbox)
+    n_replayed = runner.replay()
+
+    assert n_replayed == 1
+    set_unavailable.assert_called_once()
+    delete_points.assert_not_called()
+    runner.sold_writer.append.assert_not_called()
+
+    row = outbox._conn.execute(
+        "SELECT supabase, pinecone, bigquery FROM mutation WHERE id = ?",
+        (mutation_id,),
+    ).fetchone()
+    assert row == (APPLIED, None, None)
+    assert outbox.pending() == []
+
+
+def test_replay_bigquery_only_skips_pinecone(tmp_path, monkeypatch):
+    delete_points = MagicMock()
+    monkeypatch.setattr(src.pinecone, "delete_points_from_ids", delete_points)
+
+    outbox = Outbox(path=str(tmp_path / "outbox.db"))
+    outbox.record(UpdateBatch(["1"], ["10"], ["p1"]), ["bigquery"])
+
+    runner = make_runner(outbox)
+    runner.sold_writer.append.return_value = True
+    runner.replay()
+
+    delete_points.assert_not_called()
+    runner.sold_writer.append.assert_called_once()
+    assert outbox.pending() == []
+
+
+def test_batches_are_recorded_before_they_are_queued(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.supabase, "set_items_unavailable", MagicMock())
+    monkeypatch.setattr(
+        src.pinecone,
+        "delete_points_from_ids",
+        MagicMock(return_value=src.models.DeleteReport(n_ids=1, n_deleted=1)),
+    )
+
+    outbox = Outbox(path=str(tmp_path / "outbox.db"))
+    runner = make_runner(outbox)
+    runner.config.supabase_client = None
+    runner.writer = MagicMock()
+    runner.sold_writer.append.return_value = True
+    batch = UpdateBatch(["1"], ["10"], ["p1"])
+
+    runner._submit(batch)
+
+    ((queued, sinks, mutation_id), _) = runner.writer.submit.call_args
+    assert queued is batch
+    assert outbox.pending() == [([mutation_id], batch, ["pinecone", "bigquery"])]
+
+    result = runner._update(batch, sinks, mutation_id)
+
+    assert result.success
+    assert outbox.pending() == []
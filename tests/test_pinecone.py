@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock, patch
+
+from src.pinecone import _delete_batch, fetch_vectors
+
+
+class ApiError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def make_index(fail) -> MagicMock:
+    index = MagicMock()
+
+    def delete(ids):
+        error = fail(ids)
+
+        if error:
+            raise error
+
+        return {}
+
+    index.delete.side_effect = delete
+
+    return index
+
+
+@patch("time.sleep")
+def test_bad_payload_is_bisected_down_to_the_bad_id(_):
+    index = make_index(lambda ids: ApiError(400) if "bad" in ids else None)
+
+    _, failed, _ = _delete_batch(index, ["a", "b", "bad", "c"])
+
+    assert failed == ["bad"]
+
+
+@patch("time.sleep")
+def test_server_errors_retry_the_whole_batch(_):
+    index = make_index(lambda ids: ApiError(503))
+
+    _, failed, n_calls = _delete_batch(index, ["a", "b", "c", "d"])
+
+    assert failed == ["a", "b", "c", "d"]
+    assert all(call.kwargs["ids"] == failed for call in index.delete.call_args_list)
+    assert n_calls == index.delete.call_count
+
+
+@patch("time.sleep")
+def test_timeouts_recover_without_splitting(_):
+    errors = [TimeoutError(), ApiError(429)]
+    index = make_index(lambda ids: errors.pop(0) if errors else None)
+
+    _, failed, n_calls = _delete_batch(index, ["a", "b"])
+
+    assert failed == []
+    assert n_calls == 3
+
+
+def make_vector(point_id: str) -> MagicMock:
+    vector = MagicMock(id=point_id)
+    vector.metadata = {"id": point_id, "vinted_id": point_id, "url": "u"}
+
+    return vector
+
+
+def make_fetch_index(fail) -> MagicMock:
+    index = MagicMock()
+
+    def fetch(ids):
+        error = fail(ids)
+
+        if error:
+            raise error
+
+        vectors = {
+            point_id: make_vector(point_id) for point_id in ids if point_id != "gone"
+        }
+
+        return MagicMock(vectors=vectors)
+
+    index.fetch.side_effect = fetch
+
+    return index
+
+
+@patch("time.sleep")
+def test_fetch_retries_failed_chunks(_):
+    errors = [ApiError(503)]
+    index = make_fetch_index(lambda ids: errors.pop(0) if errors else None)
+
+    loader = fetch_vectors(index, ["a", "b", "c"], chunk_size=2, num_workers=1)
+    entries = list(loader)
+
+    assert sorted(entry.point_id for entry in entries) == ["a", "b", "c"]
+    assert loader.failed_ids == []
+    assert loader.total_rows == 3
+
+
+@patch("time.sleep")
+def test_fetch_reports_ids_it_could_not_fetch(_):
+    index = make_fetch_index(lambda ids: ApiError(503) if "b" in ids else None)
+
+    loader = fetch_vectors(index, ["a", "gone", "b", "c"], chunk_size=2)
+    entries = list(loader)
+
+    assert [entry.point_id for entry in entries] == ["a"]
+    assert loader.failed_ids == ["b", "c"]
+    assert loader.n_missing == 1
+    assert loader.total_rows == len(entries)
@@ -0,0 +1,51 @@
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import src
+from src.enums import PINECONE_TABLE_ID
+
+
+CUTOFF = date(2025, 1, 1)
+
+
+def make_client(columns):
+    client = MagicMock()
+    client.get_table.return_value = SimpleNamespace(
+        schema=[SimpleNamespace(name=name) for name in columns]
+    )
+    client.query.return_value.num_dml_affected_rows = 1
+
+    return client
+
+
+def test_has_point_dates_reads_the_schema():
+    assert src.retention.has_point_dates(make_client(["point_id", "created_at"]))
+    assert not src.retention.has_point_dates(make_client(["point_id", "item_id"]))
+
+
+def test_undated_points_are_dated_from_the_item_table():
+    sql = src.bigquery.query_points_to_delete(CUTOFF, dated=False).sql
+
+    assert "LEFT JOIN" in sql and "i.created_at" in sql
+
+
+def test_expire_before_the_migration_joins_items_for_points():
+    client = make_client(["point_id", "item_id"])
+
+    deleted = src.retention.expire(client, CUTOFF, dated=False)
+
+    statements = [call.args[0] for call in client.query.call_args_list]
+    points = next(sql for sql in statements if f".{PINECONE_TABLE_ID}` p" in sql)
+
+    assert "NOT EXISTS" in points
+    assert set(deleted) == set(src.retention.EXPIRING_TABLES)
+
+
+def test_candidate_refresh_does_not_join_the_sources_for_orphans():
+    sql = src.bigquery.query_refresh_candidates(
+        src.bigquery.EPOCH, src.bigquery.EPOCH
+    ).sql
+
+    assert "WHERE NOT EXISTS" not in sql
+    assert "WHERE NOT EXISTS" in src.bigquery.query_remove_orphan_candidates().sql
@@ -0,0 +1,53 @@
+import threading, time
+
+import src
+from src.models import ItemStatus, PineconeEntry
+
+
+def make_runner(num_workers: int) -> src.runner.Runner:
+    runner = src.runner.Runner.__new__(src.runner.Runner)
+    runner.num_workers = num_workers
+    runner.batch_by_seller = False
+    runner.cache = None
+
+    return runner
+
+
+def make_entries(n: int):
+    return [PineconeEntry(str(i), f"p{i}", str(i), "u", None) for i in range(n)]
+
+
+def test_concurrent_checks_keep_input_order_and_bound_in_flight():
+    runner = make_runner(num_workers=4)
+    lock, in_flight, peak = threading.Lock(), [0], [0]
+
+    def check(entry):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+
+        time.sleep(0.001 * (int(entry.id) % 3))
+
+        with lock:
+            in_flight[0] -= 1
+
+        return ItemStatus.SOLD if int(entry.id) % 2 else ItemStatus.AVAILABLE
+
+    runner._check_entry = check
+    results = list(runner._check_entries(make_entries(40)))
+
+    assert [entry.id for entry, _ in results] == [str(i) for i in range(40)]
+    assert all(
+        status == (ItemStatus.SOLD if int(entry.id) % 2 else ItemStatus.AVAILABLE)
+        for entry, status in results
+    )
+    assert peak[0] <= 4
+
+
+def test_single_worker_checks_sequentially():
+    runner = make_runner(num_workers=1)
+    runner._check_entry = lambda entry: ItemStatus.AVAILABLE
+
+    results = list(runner._check_entries(make_entries(3)))
+
+    assert [status for _, status in results] == [ItemStatus.AVAILABLE] * 3
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+import time
+
+from src.cache import StatusCache
+from src.models import ItemStatus
+from src.scheduler import PriorityScheduler, SellProbabilityModel, _age_hours
+
+
+NOW = datetime(2025, 1, 2, tzinfo=timezone.utc).timestamp()
+
+
+def make_model() -> SellProbabilityModel:
+    return SellProbabilityModel().fit(
+        [{"age_bucket": 0, "likes_bucket": 0, "brand": "x", "n": 10, "n_sold": 5}]
+    )
+
+
+def test_age_hours_accepts_strings_and_missing_values():
+    assert _age_hours(datetime(2025, 1, 1, tzinfo=timezone.utc), NOW) == 24
+    assert _age_hours(datetime(2025, 1, 1), NOW) == 24
+    assert _age_hours("2025-01-01T00:00:00Z", NOW) == 24
+    assert _age_hours("2025-01-01 00:00:00+00:00", NOW) == 24
+    assert _age_hours("not a date", NOW) == 0
+    assert _age_hours(None, NOW) == 0
+
+
+def test_never_checked_items_are_due():
+    scheduler = PriorityScheduler(make_model())
+    row = {"vinted_id": "1", "created_at": NOW, "num_likes": 0, "brand": "x"}
+
+    assert scheduler.score(row, NOW) > 0
+
+
+def test_recent_checks_lower_the_score(tmp_path):
+    cache = StatusCache(str(tmp_path / "cache.db"))
+    cache.put("1", ItemStatus.AVAILABLE)
+    scheduler = PriorityScheduler(make_model(), cache)
+    now = time.time()
+
+    checked = {"vinted_id": "1", "created_at": now, "num_likes": 0, "brand": "x"}
+    unchecked = {**checked, "vinted_id": "2"}
+
+    assert scheduler.score(checked, now) < scheduler.score(unchecked, now)
+    cache.close()
+
+
+def test_schedule_spends_the_budget_across_all_rows(tmp_path):
+    cache = StatusCache(str(tmp_path / "cache.db"))
+    now = time.time()
+    rows = [
+        {
+            "id": str(i),
+            "point_id": str(i),
+            "vinted_id": str(i),
+            "url": "u",
+            "created_at": now,
+            "num_likes": 0,
+            "brand": "x",
+        }
+        for i in range(10)
+    ]
+
+    for row in rows[:7]:
+        cache.put(row["vinted_id"], ItemStatus.AVAILABLE)
+
+    loader = PriorityScheduler(make_model(), cache).schedule(rows, budget=3)
+
+    assert sorted(entry.vinted_id for entry in loader.entries) == ["7", "8", "9"]
+    cache.close()
@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock
+
+from src.models import ItemStatus
+from src.status import get_statuses_wardrobe
+from src.vinted import VintedResponse
+
+
+def make_client(pages):
+    client = MagicMock()
+
+    def user_items(user_id, page):
+        items = [
+            {"id": int(vinted_id), "is_closed": False} for vinted_id in pages[page - 1]
+        ]
+        data = {"items": items, "pagination": {"total_pages": len(pages)}}
+
+        return VintedResponse(status_code=200, data=data)
+
+    client.user_items.side_effect = user_items
+
+    return client
+
+
+def test_pages_stay_below_the_group_size():
+    client = make_client([["9"], ["8"], ["7"]])
+
+    assert get_statuses_wardrobe(client, 1, ["1", "2"]) == {}
+    assert client.user_items.call_count == 1
+
+
+def test_paging_stops_once_pages_stop_paying_off():
+    client = make_client([["9"], ["1"], ["2"], ["3"]])
+
+    assert get_statuses_wardrobe(client, 1, ["1", "2", "3", "4", "5"]) == {}
+    assert client.user_items.call_count == 1
+
+
+def test_paging_continues_while_each_page_resolves_items():
+    client = make_client([["1", "2"], ["3"], ["4"], ["9"]])
+
+    statuses = get_statuses_wardrobe(client, 1, ["1", "2", "3", "4", "5", "6"])
+
+    assert statuses == {str(i): ItemStatus.AVAILABLE for i in range(1, 5)}
+    assert client.user_items.call_count == 4